@@ -0,0 +1,38 @@
+"""add_revoked_token
+
+Revision ID: 4b9e0d2c7a1f
+Revises: 07c71f4389b6
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4b9e0d2c7a1f"
+down_revision = "07c71f4389b6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "revoked_token",
+        sa.Column("jti", sa.String(length=32), nullable=False),
+        sa.Column("expires_at", sa.BigInteger(), nullable=False),
+        sa.Column("revoked_at", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index(
+        op.f("ix_revoked_token_expires_at"), "revoked_token", ["expires_at"]
+    )
+    op.create_index(
+        op.f("ix_revoked_token_revoked_at"), "revoked_token", ["revoked_at"]
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_revoked_token_revoked_at"), table_name="revoked_token")
+    op.drop_index(op.f("ix_revoked_token_expires_at"), table_name="revoked_token")
+    op.drop_table("revoked_token")
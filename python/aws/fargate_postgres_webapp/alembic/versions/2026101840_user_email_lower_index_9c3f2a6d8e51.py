@@ -0,0 +1,57 @@
+"""user_email_lower_index
+
+Revision ID: 9c3f2a6d8e51
+Revises: 4b9e0d2c7a1f
+Create Date: 2026-10-18 10:40:00.000000
+
+Replaces the case-sensitive unique index on `user_model.email` with a unique
+index on `lower(email)`. Both are built and dropped CONCURRENTLY (outside of
+the migration transaction), so writes aren't blocked on large tables. Upgrade
+fails if emails differing only in case already exist, merge them first:
+
+SELECT lower(email) FROM user_model GROUP BY 1 HAVING count(*) > 1;
+
+If a concurrent build fails it leaves an INVALID index, drop it and re-run.
+`id` already is a native uuid column, only the ORM mapping changed.
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c3f2a6d8e51"
+down_revision = "4b9e0d2c7a1f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_model_email_lower",
+            "user_model",
+            [sa.text("lower(email)")],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_user_model_email",
+            table_name="user_model",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_model_email",
+            "user_model",
+            ["email"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_user_model_email_lower",
+            table_name="user_model",
+            postgresql_concurrently=True,
+        )
@@ -1,7 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, users
+from app.api.endpoints import auth, internal, users
+from app.core import config
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
+
+if config.settings.INTERNAL_METRICS_ENABLED:
+    api_router.include_router(internal.router, prefix="/internal", tags=["internal"])
@@ -1,4 +1,5 @@
 import time
+import uuid
 from collections.abc import AsyncGenerator
 
 import jwt
@@ -8,10 +9,17 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import config, security
-from app.core.session import async_session
+from app.core.replica import replica_router
+from app.core.revocation import revocations
+from app.core.session import async_replica_session, async_session
+from app.core.token_cache import VerifiedTokenCache
 from app.models import User
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="auth/access-token")
+token_cache = VerifiedTokenCache(
+    maxsize=config.settings.TOKEN_CACHE_MAX_SIZE,
+    ttl_secs=config.settings.TOKEN_CACHE_TTL_SECONDS,
+)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -19,9 +27,60 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_session(
+    session: AsyncSession = Depends(get_session),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only work, on the replica unless it lags behind
+
+    Without a usable replica it is the request's `get_session` session, so a
+    request never checks out two primary connections.
+    """
+    if async_replica_session is None or not await replica_router.use_replica():
+        yield session
+        return
+    async with async_replica_session() as replica_session:
+        yield replica_session
+
+
+async def ensure_not_revoked(token_data: security.JWTTokenPayload) -> None:
+    # bloom filter answers most checks without a query, hits are confirmed
+    # on the primary, a lagging replica may not have the revocation yet
+    if token_data.jti is None or not revocations.might_be_revoked(token_data.jti):
+        return
+    async with async_session() as session:
+        revoked = await revocations.is_revoked(session, token_data.jti)
+    if revoked:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials, token revoked",
+        )
+
+
 async def get_current_user(
-    session: AsyncSession = Depends(get_session), token: str = Depends(reusable_oauth2)
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(reusable_oauth2),
+) -> User:
+    """Current user looked up with the request's session, for handlers that write"""
+    return await _load_current_user(token, session, session)
+
+
+async def get_current_user_read_only(
+    session: AsyncSession = Depends(get_read_session),
+    primary_session: AsyncSession = Depends(get_session),
+    token: str = Depends(reusable_oauth2),
+) -> User:
+    """Current user for read-only handlers, looked up on the replica if in sync"""
+    return await _load_current_user(token, session, primary_session)
+
+
+async def _load_current_user(
+    token: str, session: AsyncSession, primary_session: AsyncSession
 ) -> User:
+    cached = token_cache.get(token)
+    if cached is not None:
+        await ensure_not_revoked(cached.payload)
+        return cached.to_user()
+
     try:
         payload = jwt.decode(
             token, config.settings.SECRET_KEY, algorithms=[security.JWT_ALGORITHM]
@@ -45,10 +104,30 @@ async def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials, token expired or not yet valid",
         )
+    await ensure_not_revoked(token_data)
 
-    result = await session.execute(select(User).where(User.id == token_data.sub))
+    user_query = select(User).where(User.id == uuid.UUID(token_data.sub))
+    result = await session.execute(user_query)
     user = result.scalars().first()
+    if user is None and session is not primary_session:
+        # replica may not have the user yet, e.g. right after registration
+        result = await primary_session.execute(user_query)
+        user = result.scalars().first()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
+
+    token_cache.set(token, token_data, user)
     return user
+
+
+async def get_current_superuser(
+    current_user: User = Depends(get_current_user),
+) -> User:
+    """The user created from FIRST_SUPERUSER_EMAIL by `initial_data.py`"""
+    if current_user.email.lower() != config.settings.FIRST_SUPERUSER_EMAIL.lower():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges",
+        )
+    return current_user
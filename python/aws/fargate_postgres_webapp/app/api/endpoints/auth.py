@@ -1,16 +1,18 @@
 import time
+import uuid
 
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import ValidationError
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.core import config, security
+from app.core.revocation import revocations
 from app.models import User
-from app.schemas.requests import RefreshTokenRequest
+from app.schemas.requests import RefreshTokenRequest, RevokeTokenRequest
 from app.schemas.responses import AccessTokenResponse
 
 router = APIRouter()
@@ -23,16 +25,21 @@ async def login_access_token(
 ):
     """OAuth2 compatible token, get an access token for future requests using username and password"""
 
-    result = await session.execute(select(User).where(User.email == form_data.username))
+    result = await session.execute(
+        select(User).where(func.lower(User.email) == form_data.username.lower())
+    )
     user = result.scalars().first()
 
     if user is None:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
-    if not security.verify_password(form_data.password, user.hashed_password):
+    if not await security.verify_password_async(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
-    return security.generate_access_token_response(str(user.id))
+    token = security.generate_access_token_response(str(user.id))
+    return AccessTokenResponse.fast_response(token)
 
 
 @router.post("/refresh-token", response_model=AccessTokenResponse)
@@ -67,11 +74,52 @@ async def refresh_token(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials, token expired or not yet valid",
         )
+    if token_data.jti is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials, token can't be rotated",
+        )
 
-    result = await session.execute(select(User).where(User.id == token_data.sub))
+    # Rotation, every refresh token can be used once. Revoking is a single
+    # conditional insert, so concurrent reuse of the same token fails too.
+    if not await revocations.revoke(session, token_data.jti, token_data.expires_at):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials, token revoked",
+        )
+
+    result = await session.execute(
+        select(User).where(User.id == uuid.UUID(token_data.sub))
+    )
     user = result.scalars().first()
 
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return security.generate_access_token_response(str(user.id))
+    await session.commit()
+    token = security.generate_access_token_response(str(user.id))
+    return AccessTokenResponse.fast_response(token)
+
+
+@router.post("/revoke-token", status_code=204)
+async def revoke_token(
+    input: RevokeTokenRequest,
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Revoke access or refresh token, e.g. on logout"""
+    try:
+        payload = jwt.decode(
+            input.token,
+            config.settings.SECRET_KEY,
+            algorithms=[security.JWT_ALGORITHM],
+        )
+    except jwt.DecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials, unknown error",
+        )
+    token_data = security.JWTTokenPayload(**payload)
+
+    if token_data.jti is not None and token_data.expires_at > int(time.time()):
+        await revocations.revoke(session, token_data.jti, token_data.expires_at)
+        await session.commit()
@@ -0,0 +1,26 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.session import pool_metrics, pool_status
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    """Prometheus text format metrics of this process"""
+    lines = []
+    for name, value in asdict(pool_metrics).items():
+        if name.endswith("_max"):
+            metric, kind = f"db_pool_{name}", "gauge"
+        else:
+            metric, kind = f"db_pool_{name.removesuffix('_total')}_total", "counter"
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {value}")
+    for name, value in pool_status().items():
+        metric = f"db_pool_{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,22 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import delete, select
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.core.security import get_password_hash
+from app.core import config
+from app.core.security import get_password_hash_async, get_password_hashes_async
 from app.models import User
-from app.schemas.requests import UserCreateRequest, UserUpdatePasswordRequest
-from app.schemas.responses import UserResponse
+from app.schemas.requests import (
+    UserBulkCreateRequest,
+    UserCreateRequest,
+    UserUpdatePasswordRequest,
+)
+from app.schemas.responses import (
+    UserBulkCreateResponse,
+    UserBulkCreateResult,
+    UserResponse,
+)
 
 router = APIRouter()
 
+# rows per INSERT, 3 bind parameters each, asyncpg allows 32767 per statement
+BULK_INSERT_CHUNK_SIZE = 1000
+
+
+@router.get("", response_model=list[UserResponse])
+async def read_users(
+    ids: list[uuid.UUID] = Query(..., max_items=config.settings.USERS_BULK_MAX_ITEMS),
+    session: AsyncSession = Depends(deps.get_read_session),
+    current_user: User = Depends(deps.get_current_user_read_only),
+):
+    """Get users by ids, unknown ids are skipped"""
+    result = await session.execute(select(User).where(User.id.in_(ids)))
+    return result.scalars().all()
+
 
 @router.get("/me", response_model=UserResponse)
 async def read_current_user(
-    current_user: User = Depends(deps.get_current_user),
+    current_user: User = Depends(deps.get_current_user_read_only),
 ):
     """Get current user"""
-    return current_user
+    return UserResponse.fast_response(current_user)
 
 
 @router.delete("/me", status_code=204)
@@ -27,6 +53,7 @@ async def delete_current_user(
     """Delete current user"""
     await session.execute(delete(User).where(User.id == current_user.id))
     await session.commit()
+    deps.token_cache.invalidate_user(current_user.id)
 
 
 @router.post("/reset-password", response_model=UserResponse)
@@ -36,9 +63,15 @@ async def reset_current_user_password(
     current_user: User = Depends(deps.get_current_user),
 ):
     """Update current user password"""
-    current_user.hashed_password = get_password_hash(user_update_password.password)
-    session.add(current_user)
+    hashed_password = await get_password_hash_async(user_update_password.password)
+    # current_user may be a detached snapshot from deps.token_cache
+    await session.execute(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(hashed_password=hashed_password)
+    )
     await session.commit()
+    deps.token_cache.invalidate_user(current_user.id)
     return current_user
 
 
@@ -48,13 +81,82 @@ async def register_new_user(
     session: AsyncSession = Depends(deps.get_session),
 ):
     """Create new user"""
-    result = await session.execute(select(User).where(User.email == new_user.email))
+    result = await session.execute(
+        select(User).where(func.lower(User.email) == new_user.email.lower())
+    )
     if result.scalars().first() is not None:
         raise HTTPException(status_code=400, detail="Cannot use this email address")
     user = User(
         email=new_user.email,
-        hashed_password=get_password_hash(new_user.password),
+        hashed_password=await get_password_hash_async(new_user.password),
     )
     session.add(user)
     await session.commit()
     return user
+
+
+@router.post("/bulk-register", response_model=UserBulkCreateResponse)
+async def bulk_register_new_users(
+    bulk: UserBulkCreateRequest,
+    session: AsyncSession = Depends(deps.get_session),
+    current_user: User = Depends(deps.get_current_superuser),
+):
+    """Create many users with an INSERT ... ON CONFLICT DO NOTHING per chunk
+
+    All users are created in one transaction, a failed request creates
+    none of them, so it can be retried as a whole.
+    """
+    new_users: dict[str, UserCreateRequest] = {}
+    # keyed by lowercased email, unique index is case-insensitive
+    for user in bulk.users:
+        new_users.setdefault(user.email.lower(), user)
+
+    # skip bcrypt for already registered emails
+    existing = await session.scalars(
+        select(func.lower(User.email)).where(
+            func.lower(User.email).in_(list(new_users))
+        )
+    )
+    for email in existing:
+        del new_users[email]
+    # don't hold a pooled connection while hashing
+    await session.close()
+
+    hashed_passwords = await get_password_hashes_async(
+        [user.password for user in new_users.values()]
+    )
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "email": user.email,
+            "hashed_password": hashed_password,
+        }
+        for user, hashed_password in zip(new_users.values(), hashed_passwords)
+    ]
+    created: dict[str, uuid.UUID] = {}
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        result = await session.execute(
+            insert(User)
+            .values(rows[start : start + BULK_INSERT_CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=[func.lower(User.email)])
+            .returning(User.id, User.email)
+        )
+        created.update((email.lower(), user_id) for user_id, email in result.all())
+    if rows:
+        await session.commit()
+
+    results: list[UserBulkCreateResult] = []
+    seen_emails: set[str] = set()
+    for user in bulk.users:
+        email = user.email.lower()
+        if email in seen_emails:
+            status = "duplicate"
+        elif email in created:
+            status = "created"
+        else:
+            status = "exists"
+        seen_emails.add(email)
+        results.append(
+            UserBulkCreateResult(email=user.email, status=status, id=created.get(email))
+        )
+    return UserBulkCreateResponse(results=results)
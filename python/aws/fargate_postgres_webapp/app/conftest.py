@@ -9,3 +9,5 @@ import os
 
 # This will ensure using test database
 os.environ["ENVIRONMENT"] = "PYTEST"
+# bcrypt minimum, tests don't need hashes that resist brute force
+os.environ["SECURITY_BCRYPT_ROUNDS"] = "4"
@@ -37,10 +37,37 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ENVIRONMENT: Literal["DEV", "PYTEST", "STG", "PRD"] = "DEV"
     SECURITY_BCRYPT_ROUNDS: int = 12
+    SECURITY_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    SECURITY_HASHING_WORKERS: int = 2
+    SECURITY_HASHING_QUEUE_DEPTH: int = 32
+    USERS_BULK_MAX_ITEMS: int = 10000
+    # one /users/bulk-register request hashes this many passwords, about
+    # 0.3s * 5000 / SECURITY_HASHING_WORKERS at 12 bcrypt rounds
+    USERS_BULK_REGISTER_MAX_ITEMS: int = 5000
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "app.core.rate_limit.InMemoryTokenBucketBackend"
+    RATE_LIMIT_IP_PER_MINUTE: int = 60
+    RATE_LIMIT_IP_BURST: int = 20
+    RATE_LIMIT_EMAIL_PER_MINUTE: int = 5
+    RATE_LIMIT_EMAIL_BURST: int = 5
+    REVOCATION_BLOOM_BITS: int = 2**20  # 128KB, ~1% false positives at 100k
+    REVOCATION_BLOOM_HASHES: int = 7
+    REVOCATION_SYNC_SECONDS: int = 10
+    # longer than a revoking transaction can take to commit, clock skew included
+    REVOCATION_SYNC_OVERLAP_SECONDS: int = 60
+    REVOCATION_COMPACT_SECONDS: int = 3600
+    TOKEN_CACHE_MAX_SIZE: int = 10000  # 0 disables the cache
+    TOKEN_CACHE_TTL_SECONDS: int = 60
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 11520  # 8 days
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 40320  # 28 days
     BACKEND_CORS_ORIGINS: list[AnyHttpUrl] = []
     ALLOWED_HOSTS: list[str] = ["localhost", "127.0.0.1"]
+    # orjson responses on the routes using `BaseResponse.fast_response`
+    FAST_JSON_RESPONSES: bool = False
+    # written by `python -m app.prebuild`, loaded on startup only when
+    # OPENAPI_SCHEMA_PREBUILT is set (the Docker image), generated otherwise
+    OPENAPI_SCHEMA_PATH: str = f"{PROJECT_DIR}/openapi.json"
+    OPENAPI_SCHEMA_PREBUILT: bool = False
 
     # PROJECT NAME, VERSION AND DESCRIPTION
     PROJECT_NAME: str = PYPROJECT_CONTENT["name"]
@@ -55,6 +82,31 @@ class Settings(BaseSettings):
     DEFAULT_DATABASE_DB: str
     DEFAULT_SQLALCHEMY_DATABASE_URI: str = ""
 
+    # POSTGRESQL CONNECTION POOL (per process, size it against max_connections)
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: int = 30
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800  # -1 disables recycling
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100  # 0 when behind pgbouncer
+    INTERNAL_METRICS_ENABLED: bool = False
+    SERVER_TIMING_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: int = 200  # 0 disables slow query log
+
+    # POSTGRESQL READ REPLICA (optional, same user, password and db as default)
+    REPLICA_DATABASE_HOSTNAME: str = ""  # empty routes reads to default database
+    REPLICA_DATABASE_PORT: str = ""  # defaults to DEFAULT_DATABASE_PORT
+    REPLICA_SQLALCHEMY_DATABASE_URI: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 1.0
+    # seconds behind primary, 0 when all received WAL is replayed (idle primary)
+    # on Aurora use e.g. "SELECT replica_lag_in_msec / 1000.0 FROM
+    # aurora_replica_status() WHERE server_id = aurora_db_instance_identifier()"
+    REPLICA_LAG_QUERY: str = (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+        "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+
     # POSTGRESQL TEST DATABASE
     TEST_DATABASE_HOSTNAME: str = "postgres"
     TEST_DATABASE_USER: str = "postgres"
@@ -78,6 +130,19 @@ class Settings(BaseSettings):
             path=f"/{values['DEFAULT_DATABASE_DB']}",
         )
 
+    @validator("REPLICA_SQLALCHEMY_DATABASE_URI")
+    def _assemble_replica_db_connection(cls, v: str, values: dict[str, str]) -> str:
+        if not values.get("REPLICA_DATABASE_HOSTNAME"):
+            return ""
+        return PostgresDsn.build(
+            scheme="postgresql+asyncpg",
+            user=values["DEFAULT_DATABASE_USER"],
+            password=values["DEFAULT_DATABASE_PASSWORD"],
+            host=values["REPLICA_DATABASE_HOSTNAME"],
+            port=values["REPLICA_DATABASE_PORT"] or values["DEFAULT_DATABASE_PORT"],
+            path=f"/{values['DEFAULT_DATABASE_DB']}",
+        )
+
     @validator("TEST_SQLALCHEMY_DATABASE_URI")
     def _assemble_test_db_connection(cls, v: str, values: dict[str, str]) -> str:
         return PostgresDsn.build(
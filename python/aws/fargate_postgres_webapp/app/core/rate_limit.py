@@ -0,0 +1,169 @@
+"""
+Token bucket rate limiting of expensive unauthenticated endpoints.
+
+`RateLimitMiddleware` limits requests to the login and register endpoints per
+client IP and per email (form `username` or JSON `email` field), so a single
+client can't keep the bcrypt pool busy. Buckets live in a backend set with
+`RATE_LIMIT_BACKEND` (dotted path). The default `InMemoryTokenBucketBackend`
+is per process. To share buckets between workers and tasks, subclass
+`TokenBucketBackend` (e.g. with Redis) and point the setting at it.
+
+Behind a load balancer run uvicorn with `--proxy-headers --forwarded-allow-ips`
+so that the client IP in ASGI scope is the real one.
+"""
+
+import abc
+import json
+import time
+from collections import OrderedDict
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config
+
+MAX_INSPECTED_BODY_BYTES = 64 * 1024
+
+
+class TokenBucketBackend(abc.ABC):
+    @abc.abstractmethod
+    async def take(self, key: str, per_minute: int, burst: int) -> float:
+        """Takes one token from `key` bucket
+
+        Returns 0 if request is allowed, otherwise seconds until next token.
+        """
+
+    @abc.abstractmethod
+    async def clear(self) -> None:
+        """Drops all buckets, e.g. between tests"""
+
+
+class InMemoryTokenBucketBackend(TokenBucketBackend):
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, per_minute: int, burst: int) -> float:
+        rate = per_minute / 60
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated_at) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        # least recently used buckets are the fullest ones, drop them first
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    async def clear(self) -> None:
+        self._buckets.clear()
+
+
+def create_backend() -> TokenBucketBackend:
+    module_name, class_name = config.settings.RATE_LIMIT_BACKEND.rsplit(".", 1)
+    return getattr(import_module(module_name), class_name)()
+
+
+def _email_from_body(body: bytes, content_type: str) -> str | None:
+    try:
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            values = parse_qs(body.decode())
+            return values.get("username", [None])[0]
+        if content_type.startswith("application/json"):
+            email = json.loads(body).get("email")
+            return email if isinstance(email, str) else None
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware, so the inspected body can be replayed to the app"""
+
+    def __init__(
+        self, app: ASGIApp, backend: TokenBucketBackend, paths: list[str]
+    ) -> None:
+        self.app = app
+        self.backend = backend
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        settings = config.settings
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        retry_after = await self.backend.take(
+            f"ip:{client_ip}",
+            settings.RATE_LIMIT_IP_PER_MINUTE,
+            settings.RATE_LIMIT_IP_BURST,
+        )
+        if retry_after:
+            await self._reject(scope, receive, send, retry_after)
+            return
+
+        body, receive = await self._buffer_body(receive)
+        headers = dict(scope["headers"])
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        email = _email_from_body(body, content_type) if body is not None else None
+        if email:
+            retry_after = await self.backend.take(
+                f"email:{email.lower()}",
+                settings.RATE_LIMIT_EMAIL_PER_MINUTE,
+                settings.RATE_LIMIT_EMAIL_BURST,
+            )
+            if retry_after:
+                await self._reject(scope, receive, send, retry_after)
+                return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _buffer_body(receive: Receive) -> tuple[bytes | None, Receive]:
+        """Reads request body up to MAX_INSPECTED_BODY_BYTES
+
+        Returns body (None if too large) and `receive` that replays it.
+        """
+        messages: list[Message] = []
+        size = 0
+        more_body = True
+        while more_body and size <= MAX_INSPECTED_BODY_BYTES:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        body = None
+        if not more_body and size <= MAX_INSPECTED_BODY_BYTES:
+            body = b"".join(m.get("body", b"") for m in messages)
+
+        async def replay() -> Message:
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return body, replay
+
+    @staticmethod
+    async def _reject(
+        scope: Scope, receive: Receive, send: Send, retry_after: float
+    ) -> None:
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, try again later"},
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,77 @@
+"""
+Lag-aware routing of read-only sessions to the read replica.
+
+`deps.get_read_session` asks `replica_router.use_replica()` before opening a
+session. The replica lag (REPLICA_LAG_QUERY) is measured at most every
+REPLICA_LAG_CHECK_SECONDS by the request that finds the last measurement stale,
+reads go to the primary while the lag is above REPLICA_MAX_LAG_SECONDS, the
+check fails or no replica is configured.
+"""
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core import config
+from app.core.session import replica_engine
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        engine: AsyncEngine | None,
+        max_lag_secs: float,
+        check_interval_secs: float,
+        check_timeout_secs: float = 1.0,
+    ) -> None:
+        self.engine = engine
+        self.max_lag_secs = max_lag_secs
+        self.check_interval_secs = check_interval_secs
+        self.check_timeout_secs = check_timeout_secs
+        self.lag_secs: float | None = None
+        self.checked_at = float("-inf")
+        self._healthy = False
+
+    async def _measure_lag(self) -> float | None:
+        assert self.engine is not None
+        async with self.engine.connect() as conn:
+            lag = await conn.scalar(text(config.settings.REPLICA_LAG_QUERY))
+        return None if lag is None else float(lag)
+
+    async def use_replica(self) -> bool:
+        if self.engine is None:
+            return False
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval_secs:
+            return self._healthy
+
+        # set before awaiting, so concurrent requests don't check again
+        self.checked_at = now
+        try:
+            self.lag_secs = await asyncio.wait_for(
+                self._measure_lag(), timeout=self.check_timeout_secs
+            )
+        except Exception:
+            logger.warning("Replica lag check failed, reading from primary")
+            self.lag_secs = None
+        healthy = self.lag_secs is not None and self.lag_secs <= self.max_lag_secs
+        if self._healthy and not healthy and self.lag_secs is not None:
+            logger.warning(
+                "Replica lag %.2fs above %.2fs, reading from primary",
+                self.lag_secs,
+                self.max_lag_secs,
+            )
+        self._healthy = healthy
+        return healthy
+
+
+replica_router = ReplicaRouter(
+    replica_engine,
+    max_lag_secs=config.settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval_secs=config.settings.REPLICA_LAG_CHECK_SECONDS,
+)
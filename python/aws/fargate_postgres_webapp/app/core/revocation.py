@@ -0,0 +1,140 @@
+"""
+Token revocation backed by `revoked_token` table and an in-memory bloom filter.
+
+Every token carries a random `jti`. Revoked jtis are stored in the database
+until the token would expire anyway, and every process mirrors them in a bloom
+filter, so checking a token costs no database query unless the filter reports
+a (possible) hit, which is then confirmed in the database.
+
+`run_maintenance` keeps the filter in sync with rows revoked by other processes
+every REVOCATION_SYNC_SECONDS and compacts it every REVOCATION_COMPACT_SECONDS
+(expired rows are deleted and the filter is rebuilt, bloom filters can't
+forget entries on their own).
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.core.session import async_session
+from app.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    def __init__(self, bits: int, hashes: int) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key: str) -> list[int]:
+        # double hashing, k positions out of two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    def __init__(self, bits: int, hashes: int, sync_overlap: int = 0) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self.sync_overlap = sync_overlap
+        self.bloom = BloomFilter(bits, hashes)
+        self.synced_until = 0
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """O(1), no false negatives, confirm hits with `is_revoked`"""
+        return jti in self.bloom
+
+    async def is_revoked(self, session: AsyncSession, jti: str) -> bool:
+        result = await session.execute(
+            select(RevokedToken.jti).where(RevokedToken.jti == jti)
+        )
+        return result.first() is not None
+
+    async def revoke(self, session: AsyncSession, jti: str, expires_at: int) -> bool:
+        """Adds jti to revoked tokens, caller commits the session
+
+        Returns False if it was already revoked, e.g. concurrent refresh token reuse.
+        """
+        result = await session.execute(
+            insert(RevokedToken)
+            .values(jti=jti, expires_at=expires_at, revoked_at=int(time.time()))
+            .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+            .returning(RevokedToken.jti)
+        )
+        self.bloom.add(jti)
+        return result.first() is not None
+
+    async def sync(self, session: AsyncSession) -> None:
+        """Adds tokens revoked by other processes since last sync"""
+        # revoked_at is set before the row commits, so a row can become visible
+        # after rows with a later revoked_at were synced, rows from the last
+        # `sync_overlap` seconds are read again (adding a jti twice is a no-op)
+        result = await session.execute(
+            select(RevokedToken.jti, RevokedToken.revoked_at).where(
+                RevokedToken.revoked_at >= self.synced_until - self.sync_overlap
+            )
+        )
+        for jti, revoked_at in result:
+            self.bloom.add(jti)
+            self.synced_until = max(self.synced_until, revoked_at)
+
+    async def compact(self, session: AsyncSession) -> None:
+        """Deletes expired rows and rebuilds the filter from the remaining ones"""
+        await session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at < int(time.time()))
+        )
+        await session.commit()
+        bloom, synced_until = self.bloom, self.synced_until
+        self.bloom = BloomFilter(self.bits, self.hashes)
+        self.synced_until = 0
+        try:
+            await self.sync(session)
+        except Exception:
+            # keep the old filter, it has no false negatives either
+            self.bloom, self.synced_until = bloom, synced_until
+            raise
+
+    async def run_maintenance(self) -> None:
+        """Background task started in `app.main`, runs until cancelled"""
+        last_compaction = time.monotonic()
+        while True:
+            try:
+                async with async_session() as session:
+                    if (
+                        time.monotonic() - last_compaction
+                        >= config.settings.REVOCATION_COMPACT_SECONDS
+                    ):
+                        await self.compact(session)
+                        last_compaction = time.monotonic()
+                    else:
+                        await self.sync(session)
+            except Exception:
+                logger.exception("Revocation list sync failed")
+            await asyncio.sleep(config.settings.REVOCATION_SYNC_SECONDS)
+
+
+revocations = RevocationList(
+    bits=config.settings.REVOCATION_BLOOM_BITS,
+    hashes=config.settings.REVOCATION_BLOOM_HASHES,
+    sync_overlap=config.settings.REVOCATION_SYNC_OVERLAP_SECONDS,
+)
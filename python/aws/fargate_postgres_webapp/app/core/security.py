@@ -1,6 +1,11 @@
 """Black-box security shortcuts to generate JWT tokens and password hashing and verifcation."""
 
+import asyncio
 import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TypeVar
 
 import jwt
 from passlib.context import CryptContext
@@ -18,12 +23,83 @@ PWD_CONTEXT = CryptContext(
     bcrypt__rounds=config.settings.SECURITY_BCRYPT_ROUNDS,
 )
 
+T = TypeVar("T")
+
+
+class PasswordHashingOverloadedError(Exception):
+    """Raised when the password hashing pool queue is full."""
+
+
+class PasswordHashingPool:
+    """Runs blocking bcrypt calls on an executor outside of the event loop.
+
+    At most `max_pending` calls (running plus queued) are accepted per process,
+    anything above that fails fast with `PasswordHashingOverloadedError` instead
+    of piling up behind ~0.3s bcrypt calls.
+
+    The executor is created on first use. A process forked after that (gunicorn
+    `preload_app`) must call `after_fork`, the executor's threads and queues
+    belong to the parent.
+    """
+
+    def __init__(
+        self, executor_factory: Callable[[], Executor], max_pending: int
+    ) -> None:
+        self.executor_factory = executor_factory
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self.executor_factory()
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            raise PasswordHashingOverloadedError(
+                f"Password hashing queue is full ({self.max_pending} pending)"
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def after_fork(self) -> None:
+        """Forgets the parent's executor, the next call creates a new one"""
+        self._executor = None
+        self.pending = 0
+
+
+def _create_hashing_executor() -> Executor:
+    workers = config.settings.SECURITY_HASHING_WORKERS
+    if config.settings.SECURITY_HASHING_EXECUTOR == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwd-hashing")
+
+
+PWD_POOL = PasswordHashingPool(
+    _create_hashing_executor,
+    max_pending=config.settings.SECURITY_HASHING_WORKERS
+    + config.settings.SECURITY_HASHING_QUEUE_DEPTH,
+)
+
 
 class JWTTokenPayload(BaseModel):
     sub: str | int
     refresh: bool
     issued_at: int
     expires_at: int
+    # unique token id used for revocation, missing in tokens issued before it
+    jti: str | None = None
 
 
 def create_jwt_token(subject: str | int, exp_secs: int, refresh: bool):
@@ -43,6 +119,7 @@ def create_jwt_token(subject: str | int, exp_secs: int, refresh: bool):
         "expires_at": expires_at,
         "sub": subject,
         "refresh": refresh,
+        "jti": uuid.uuid4().hex,
     }
     encoded_jwt = jwt.encode(
         to_encode,
@@ -87,3 +164,45 @@ def get_password_hash(password: str) -> str:
     It takes about 0.3s for default 12 rounds of SECURITY_BCRYPT_DEFAULT_ROUNDS.
     """
     return PWD_CONTEXT.hash(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Non-blocking `verify_password`, use it from async request handlers
+
+    Raises PasswordHashingOverloadedError when the hashing queue is full.
+    """
+    return await PWD_POOL.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Non-blocking `get_password_hash`, use it from async request handlers
+
+    Raises PasswordHashingOverloadedError when the hashing queue is full.
+    """
+    return await PWD_POOL.run(get_password_hash, password)
+
+
+async def get_password_hashes_async(passwords: list[str]) -> list[str]:
+    """Hashes many passwords in parallel, order of results matches input
+
+    Uses at most SECURITY_HASHING_WORKERS pool slots, so single-user requests
+    still get a share of the queue while bulk hashing is running.
+    """
+    hashes = [""] * len(passwords)
+    indexes = iter(range(len(passwords)))
+
+    async def worker() -> None:
+        for i in indexes:
+            hashes[i] = await PWD_POOL.run(get_password_hash, passwords[i])
+
+    workers = [
+        asyncio.ensure_future(worker())
+        for _ in range(min(config.settings.SECURITY_HASHING_WORKERS, len(passwords)))
+    ]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        raise
+    return hashes
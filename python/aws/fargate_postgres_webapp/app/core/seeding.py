@@ -0,0 +1,167 @@
+"""
+Bulk, idempotent loading of users from fixture files, used by `initial_data.py`.
+
+Rows are streamed from JSON, JSON Lines or CSV files (or generated) in batches,
+copied with PostgreSQL `COPY` into a temporary table and merged into
+`user_model` with `INSERT ... ON CONFLICT`, so the loader can be re-run safely.
+
+Fixture rows need `email` and either `password` or `hashed_password`, `id` is
+optional. Every distinct plain password is hashed once per run, on a process
+pool of `hash_workers` when a batch has more than one to hash, rows sharing a
+password share its hash. This is meant for dev and staging fixtures (e.g. 1M
+users with the same password), not real accounts.
+"""
+
+import csv
+import json
+import logging
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+
+from app.core import security
+from app.core.session import async_engine
+from app.models import User
+
+SEED_TABLE = "seed_user_model"
+SEED_COLUMNS = ["id", "email", "hashed_password"]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SeedReport:
+    rows: int = 0
+    inserted: int = 0
+    hashed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows} rows ({self.inserted} new, {self.hashed} passwords hashed) "
+            f"in {self.seconds:.2f}s, {self.rows_per_second:.0f} rows/s"
+        )
+
+
+def read_fixture(path: Path) -> Iterator[dict[str, str]]:
+    """Yields user rows from .json (list of objects), .jsonl or .csv file"""
+    if path.suffix == ".csv":
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+    elif path.suffix == ".jsonl":
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.suffix == ".json":
+        with open(path) as f:
+            yield from json.load(f)
+    else:
+        raise ValueError(f"Unsupported fixture format: {path}")
+
+
+def generate_users(
+    count: int, password: str, domain: str = "example.com"
+) -> Iterator[dict[str, str]]:
+    """Yields `count` synthetic users with deterministic emails"""
+    for i in range(count):
+        yield {"email": f"user{i}@{domain}", "password": password}
+
+
+class UserLoader:
+    def __init__(
+        self, batch_size: int = 50_000, overwrite: bool = False, hash_workers: int = 4
+    ) -> None:
+        self.batch_size = batch_size
+        self.overwrite = overwrite
+        self.hash_workers = hash_workers
+        self._hashes: dict[str, str] = {}
+        self._executor: Executor | None = None
+
+    def _hash_missing(self, batch: list[dict[str, str]]) -> int:
+        passwords = {
+            row["password"]
+            for row in batch
+            if not row.get("hashed_password") and row["password"] not in self._hashes
+        }
+        if len(passwords) > 1:
+            # started on first use, fixtures sharing one password never need it
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.hash_workers)
+            hashed = self._executor.map(
+                security.get_password_hash, passwords, chunksize=16
+            )
+            self._hashes.update(zip(passwords, hashed))
+        else:
+            self._hashes.update((p, security.get_password_hash(p)) for p in passwords)
+        return len(passwords)
+
+    def _records(self, batch: list[dict[str, str]]) -> list[tuple]:
+        return [
+            (
+                uuid.UUID(row["id"]) if row.get("id") else uuid.uuid4(),
+                row["email"],
+                row.get("hashed_password") or self._hashes[row["password"]],
+            )
+            for row in batch
+        ]
+
+    def _merge_sql(self) -> str:
+        table = User.__tablename__
+        if self.overwrite:
+            on_conflict = (
+                "ON CONFLICT ((lower(email))) "
+                "DO UPDATE SET hashed_password = EXCLUDED.hashed_password"
+            )
+        else:
+            on_conflict = "ON CONFLICT DO NOTHING"
+        # DISTINCT ON, one statement can't affect the same row twice,
+        # lower() as in the case-insensitive unique index on email
+        return (
+            f"INSERT INTO {table} ({', '.join(SEED_COLUMNS)}) "
+            f"SELECT DISTINCT ON (lower(email)) {', '.join(SEED_COLUMNS)} FROM {SEED_TABLE} "
+            f"{on_conflict}"
+        )
+
+    async def load(self, rows: Iterable[dict[str, str]]) -> SeedReport:
+        report = SeedReport()
+        start = time.perf_counter()
+        rows = iter(rows)
+
+        async with async_engine.begin() as conn:
+            # through SQLAlchemy, the asyncpg adapter sends BEGIN only before
+            # its first statement, raw driver calls before it run in autocommit
+            # and ON COMMIT DROP would drop the table right away
+            await conn.exec_driver_sql(
+                f"CREATE TEMP TABLE {SEED_TABLE} "
+                f"(LIKE {User.__tablename__} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            raw_connection = await conn.get_raw_connection()
+            driver = raw_connection.driver_connection
+            try:
+                while batch := list(islice(rows, self.batch_size)):
+                    report.hashed += self._hash_missing(batch)
+                    await driver.copy_records_to_table(
+                        SEED_TABLE, records=self._records(batch), columns=SEED_COLUMNS
+                    )
+                    # merge batch by batch to keep the temp table small
+                    status = await driver.execute(self._merge_sql())
+                    await driver.execute(f"TRUNCATE {SEED_TABLE}")
+                    report.inserted += int(status.rsplit(" ", 1)[-1])
+                    report.rows += len(batch)
+                    logger.info("%d rows loaded", report.rows)
+            finally:
+                if self._executor is not None:
+                    self._executor.shutdown()
+                    self._executor = None
+
+        report.seconds = time.perf_counter() - start
+        return report
@@ -2,17 +2,191 @@
 SQLAlchemy async engine and sessions tools
 
 https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html
+
+Connection pool is tuned with `DATABASE_POOL_*` settings, `pool_metrics`
+collects checkout counters and wait times exposed by `/internal/metrics`.
+
+Every statement is timed, statements slower than SLOW_QUERY_THRESHOLD_MS are
+logged and, within a request, added to `request_query_stats` set up by
+`app.core.timing.ServerTimingMiddleware`.
+
+When REPLICA_DATABASE_HOSTNAME is set, `async_replica_session` opens sessions
+on the read replica, `app.core.replica.replica_router` decides when to use it.
 """
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import json
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core import config
 
+logger = logging.getLogger(__name__)
+
 if config.settings.ENVIRONMENT == "PYTEST":
     sqlalchemy_database_uri = config.settings.TEST_SQLALCHEMY_DATABASE_URI
+    replica_database_uri = ""
 else:
     sqlalchemy_database_uri = config.settings.DEFAULT_SQLALCHEMY_DATABASE_URI
+    replica_database_uri = config.settings.REPLICA_SQLALCHEMY_DATABASE_URI
+
+
+@dataclass
+class PoolMetrics:
+    connects: int = 0
+    checkouts: int = 0
+    checkins: int = 0
+    invalidations: int = 0
+    soft_invalidations: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+pool_metrics = PoolMetrics()
+
+
+@dataclass
+class RequestQueryStats:
+    request: str
+    count: int = 0
+    seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
 
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
 
-async_engine = create_async_engine(sqlalchemy_database_uri, pool_pre_ping=True)
+
+request_query_stats: ContextVar[RequestQueryStats | None] = ContextVar(
+    "request_query_stats", default=None
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection.
+
+    Wait time includes waiting for a free slot, opening new connections
+    and the pre-ping round-trip, when enabled.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            pool_metrics.wait_seconds_total += waited
+            pool_metrics.wait_seconds_max = max(pool_metrics.wait_seconds_max, waited)
+
+
+def _create_engine(uri: str, poolclass: type[AsyncAdaptedQueuePool]) -> AsyncEngine:
+    return create_async_engine(
+        uri,
+        poolclass=poolclass,
+        pool_size=config.settings.DATABASE_POOL_SIZE,
+        max_overflow=config.settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=config.settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        pool_recycle=config.settings.DATABASE_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=config.settings.DATABASE_POOL_PRE_PING,
+        connect_args={
+            # asyncpg's own cache and SQLAlchemy adapter cache of prepared statements
+            "statement_cache_size": config.settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": config.settings.DATABASE_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+async_engine = _create_engine(sqlalchemy_database_uri, InstrumentedQueuePool)
 async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# read replica, pool metrics cover the primary only
+replica_engine = (
+    _create_engine(replica_database_uri, AsyncAdaptedQueuePool)
+    if replica_database_uri
+    else None
+)
+async_replica_session = (
+    async_sessionmaker(replica_engine, expire_on_commit=False)
+    if replica_engine is not None
+    else None
+)
+
+
+# BEGIN/COMMIT don't go through the cursor events, savepoints do, the
+# per-request stats count queries only
+_TRANSACTION_CONTROL = ("SAVEPOINT ", "RELEASE SAVEPOINT ", "ROLLBACK TO SAVEPOINT ")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info.pop("query_started_at")
+    stats = request_query_stats.get()
+    if stats is not None and not statement.startswith(_TRANSACTION_CONTROL):
+        stats.record(statement, seconds)
+
+    threshold_ms = config.settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold_ms > 0 and seconds * 1000 >= threshold_ms:
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "duration_ms": round(seconds * 1000, 2),
+                    "request": stats.request if stats else None,
+                    "statement": statement,
+                }
+            )
+        )
+
+
+for _engine in filter(None, [async_engine, replica_engine]):
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@event.listens_for(async_engine.sync_engine.pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.connects += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.checkouts += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics.checkins += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.invalidations += 1
+
+
+@event.listens_for(async_engine.sync_engine.pool, "soft_invalidate")
+def _on_soft_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.soft_invalidations += 1
+
+
+def pool_status() -> dict[str, int]:
+    """Current pool gauges, see `QueuePool.status()`"""
+    pool = async_engine.sync_engine.pool
+    assert isinstance(pool, InstrumentedQueuePool)
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
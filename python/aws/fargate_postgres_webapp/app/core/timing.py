@@ -0,0 +1,70 @@
+"""
+Per-request DB instrumentation, see `request_query_stats` in `app/core/session.py`.
+
+`ServerTimingMiddleware` collects query count, total DB time and the slowest
+statement of every request. They are reported in `Server-Timing` response
+header (visible in browser dev tools) and requests that spent more than
+SLOW_QUERY_THRESHOLD_MS in the database are logged with the slowest statement.
+"""
+
+import json
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config
+from app.core.session import RequestQueryStats, request_query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app: ASGIApp, server_timing: bool = True) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(request=f"{scope['method']} {scope['path']}")
+        token = request_query_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.server_timing:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+                    f"app;dur={elapsed_ms:.2f}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_query_stats.reset(token)
+            self._log_if_slow(stats)
+
+    @staticmethod
+    def _log_if_slow(stats: RequestQueryStats) -> None:
+        threshold_ms = config.settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold_ms <= 0 or stats.seconds * 1000 < threshold_ms:
+            return
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_request_queries",
+                    "request": stats.request,
+                    "queries": stats.count,
+                    "db_ms": round(stats.seconds * 1000, 2),
+                    "slowest_ms": round(stats.slowest_seconds * 1000, 2),
+                    "slowest_statement": stats.slowest_statement,
+                }
+            )
+        )
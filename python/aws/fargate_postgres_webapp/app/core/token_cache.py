@@ -0,0 +1,103 @@
+"""
+Per-process cache of verified access tokens used by `deps.get_current_user`.
+
+Entries are keyed by sha256 digest of the raw token, so tokens themselves are
+never kept in memory. Every entry holds the decoded payload and a snapshot of
+the user row, and expires at the earlier of token `expires_at` and
+`TOKEN_CACHE_TTL_SECONDS` from now. The TTL bounds how long other processes
+(which can't see local invalidations) may serve a stale user.
+"""
+
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.core.security import JWTTokenPayload
+from app.models import User
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    payload: JWTTokenPayload
+    user_id: uuid.UUID
+    email: str
+    hashed_password: str
+    expires_at: float
+
+    def to_user(self) -> User:
+        """Detached `User` built from the snapshot, it is not bound to any session"""
+        return User(
+            id=self.user_id, email=self.email, hashed_password=self.hashed_password
+        )
+
+
+class VerifiedTokenCache:
+    """Bounded LRU cache of verified tokens with per entry expiry."""
+
+    def __init__(self, maxsize: int, ttl_secs: int) -> None:
+        self.maxsize = maxsize
+        self.ttl_secs = ttl_secs
+        self._entries: OrderedDict[str, CachedToken] = OrderedDict()
+        self._keys_by_user: dict[uuid.UUID, set[str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_secs > 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> CachedToken | None:
+        if not self.enabled:
+            return None
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() > entry.expires_at:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, token: str, payload: JWTTokenPayload, user: User) -> None:
+        if not self.enabled:
+            return
+        key = self._key(token)
+        user_id = user.id
+        self._remove(key)
+        self._entries[key] = CachedToken(
+            payload=payload,
+            user_id=user_id,
+            email=user.email,
+            hashed_password=user.hashed_password,
+            expires_at=min(payload.expires_at, time.time() + self.ttl_secs),
+        )
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """Drops every cached token of given user, e.g. after deletion"""
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_keys = self._keys_by_user.get(entry.user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry.user_id]
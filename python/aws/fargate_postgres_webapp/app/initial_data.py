@@ -2,41 +2,55 @@
 Put here any Python code that must be runned before application startup.
 It is included in `init.sh` script.
 
-By defualt `main` create a superuser if not exists
+By defualt `main` create a superuser if not exists, optionally it also loads
+users from fixture files or generates synthetic ones, see `app/core/seeding.py`
+
+python -m app.initial_data fixtures/users.csv --generate-users 1000000
 """
 
+import argparse
 import asyncio
+import logging
+from itertools import chain
+from pathlib import Path
 
-from sqlalchemy import select
-
-from app.core import config, security
-from app.core.session import async_session
-from app.models import User
+from app.core import config
+from app.core.seeding import UserLoader, generate_users, read_fixture
 
 
-async def main() -> None:
+async def main(
+    fixtures: list[Path] | None = None,
+    generate: int = 0,
+    generate_password: str = "password",
+    overwrite: bool = False,
+) -> None:
     print("Start initial data")
-    async with async_session() as session:
-        result = await session.execute(
-            select(User).where(User.email == config.settings.FIRST_SUPERUSER_EMAIL)
-        )
-        user = result.scalars().first()
-
-        if user is None:
-            new_superuser = User(
-                email=config.settings.FIRST_SUPERUSER_EMAIL,
-                hashed_password=security.get_password_hash(
-                    config.settings.FIRST_SUPERUSER_PASSWORD
-                ),
-            )
-            session.add(new_superuser)
-            await session.commit()
-            print("Superuser was created")
-        else:
-            print("Superuser already exists in database")
-
-        print("Initial data created")
+    superuser = {
+        "email": config.settings.FIRST_SUPERUSER_EMAIL,
+        "password": config.settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    rows = chain(
+        [superuser],
+        *(read_fixture(path) for path in fixtures or []),
+        generate_users(generate, generate_password),
+    )
+    report = await UserLoader(overwrite=overwrite).load(rows)
+    print(f"Loaded {report}")
+
+    print("Initial data created")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Create initial data in DB")
+    parser.add_argument("fixtures", nargs="*", type=Path, help=".json/.jsonl/.csv")
+    parser.add_argument("--generate-users", type=int, default=0, metavar="N")
+    parser.add_argument("--generate-password", default="password")
+    parser.add_argument(
+        "--overwrite", action="store_true", help="update passwords of existing users"
+    )
+    args = parser.parse_args()
+    # progress of `UserLoader.load`
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(
+        main(args.fixtures, args.generate_users, args.generate_password, args.overwrite)
+    )
@@ -1,11 +1,18 @@
 """Main FastAPI app instance declaration."""
 
-from fastapi import FastAPI
+import asyncio
+import json
+from pathlib import Path
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api.api import api_router
-from app.core import config
+from app.core import config, rate_limit, security
+from app.core.revocation import revocations
+from app.core.timing import ServerTimingMiddleware
 
 app = FastAPI(
     title=config.settings.PROJECT_NAME,
@@ -16,6 +23,23 @@ app = FastAPI(
 )
 app.include_router(api_router)
 
+# Limits bcrypt heavy unauthenticated endpoints per client IP and email
+rate_limit_backend = rate_limit.create_backend()
+if config.settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        rate_limit.RateLimitMiddleware,
+        backend=rate_limit_backend,
+        paths=[
+            app.url_path_for("login_access_token"),
+            app.url_path_for("register_new_user"),
+        ],
+    )
+
+# Per-request query count and DB time, Server-Timing header and slow query log
+app.add_middleware(
+    ServerTimingMiddleware, server_timing=config.settings.SERVER_TIMING_ENABLED
+)
+
 # Sets all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -27,3 +51,48 @@ app.add_middleware(
 
 # Guards against HTTP Host Header attacks
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=config.settings.ALLOWED_HOSTS)
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Load balancer health check, doesn't touch the database"""
+    return {"status": "ok"}
+
+
+@app.exception_handler(security.PasswordHashingOverloadedError)
+async def password_hashing_overloaded_handler(
+    request: Request, exc: security.PasswordHashingOverloadedError
+):
+    # Reject early so login storms don't queue up behind bcrypt
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.on_event("startup")
+async def start_revocation_maintenance():
+    app.state.revocation_maintenance = asyncio.create_task(
+        revocations.run_maintenance()
+    )
+
+
+@app.on_event("shutdown")
+def shutdown_password_hashing_pool():
+    security.PWD_POOL.shutdown()
+
+
+@app.on_event("shutdown")
+def stop_revocation_maintenance():
+    app.state.revocation_maintenance.cancel()
+
+
+@app.on_event("startup")
+def load_openapi_schema():
+    """Use prebuilt schema or build it now, not on the first user request"""
+    if config.settings.OPENAPI_SCHEMA_PREBUILT:
+        path = Path(config.settings.OPENAPI_SCHEMA_PATH)
+        app.openapi_schema = json.loads(path.read_text())
+    else:
+        app.openapi()
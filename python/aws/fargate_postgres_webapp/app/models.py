@@ -15,7 +15,7 @@ alembic upgrade head
 """
 import uuid
 
-from sqlalchemy import String
+from sqlalchemy import BigInteger, Index, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
@@ -27,10 +27,23 @@ class Base(DeclarativeBase):
 class User(Base):
     __tablename__ = "user_model"
 
-    id: Mapped[str] = mapped_column(
-        UUID(as_uuid=False), primary_key=True, default=lambda _: str(uuid.uuid4())
-    )
-    email: Mapped[str] = mapped_column(
-        String(254), nullable=False, unique=True, index=True
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
+    # unique case-insensitively, see `ix_user_model_email_lower`,
+    # look users up with `func.lower(User.email) == email.lower()`
+    email: Mapped[str] = mapped_column(String(254), nullable=False)
     hashed_password: Mapped[str] = mapped_column(String(128), nullable=False)
+
+
+Index("ix_user_model_email_lower", func.lower(User.email), unique=True)
+
+
+class RevokedToken(Base):
+    """Revoked JWT ids, rows are deleted once the token expires anyway"""
+
+    __tablename__ = "revoked_token"
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    expires_at: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    revoked_at: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
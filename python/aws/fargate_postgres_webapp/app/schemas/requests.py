@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+
+from app.core import config
 
 
 class BaseRequest(BaseModel):
@@ -10,6 +12,10 @@ class RefreshTokenRequest(BaseRequest):
     refresh_token: str
 
 
+class RevokeTokenRequest(BaseRequest):
+    token: str
+
+
 class UserUpdatePasswordRequest(BaseRequest):
     password: str
 
@@ -17,3 +23,9 @@ class UserUpdatePasswordRequest(BaseRequest):
 class UserCreateRequest(BaseRequest):
     email: EmailStr
     password: str
+
+
+class UserBulkCreateRequest(BaseRequest):
+    users: list[UserCreateRequest] = Field(
+        ..., min_items=1, max_items=config.settings.USERS_BULK_REGISTER_MAX_ITEMS
+    )
@@ -1,11 +1,48 @@
+import uuid
+from typing import Any, Literal
+
+import orjson
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, EmailStr
 
+from app.core import config
+
+
+def _orjson_default(value: Any) -> str:
+    # asyncpg returns its own uuid.UUID subclass, orjson only takes uuid.UUID
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError
+
+
+class ModelORJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
 
 class BaseResponse(BaseModel):
     # may define additional fields or config shared across responses
     class Config:
         orm_mode = True
 
+    @classmethod
+    def orjson_response(cls, obj: Any) -> ModelORJSONResponse:
+        """Validated `obj` serialized by orjson, skipping `jsonable_encoder`"""
+        return ModelORJSONResponse(cls.from_orm(obj).dict())
+
+    @classmethod
+    def fast_response(cls, obj: Any) -> Any:
+        """Opt-in fast path for a route returning `obj`
+
+        `orjson_response` when `FAST_JSON_RESPONSES` is on, otherwise `obj` for
+        FastAPI's generic response_model path. The JSON body is the same.
+        """
+        if config.settings.FAST_JSON_RESPONSES:
+            return cls.orjson_response(obj)
+        return obj
+
 
 class AccessTokenResponse(BaseResponse):
     token_type: str
@@ -18,5 +55,16 @@ class AccessTokenResponse(BaseResponse):
 
 
 class UserResponse(BaseResponse):
-    id: str
+    id: uuid.UUID
     email: EmailStr
+
+
+class UserBulkCreateResult(BaseResponse):
+    email: EmailStr
+    # "exists" - already registered, "duplicate" - repeated within the request
+    status: Literal["created", "exists", "duplicate"]
+    id: uuid.UUID | None = None
+
+
+class UserBulkCreateResponse(BaseResponse):
+    results: list[UserBulkCreateResult]
@@ -1,16 +1,43 @@
+"""
+Test fixtures, run with ENVIRONMENT=PYTEST against the test database.
+
+Tables are created once per session. Every test runs inside a transaction on a
+single connection that is rolled back afterwards: `async_session` is bound to
+that connection and every session the app opens joins the transaction in its
+own SAVEPOINT, so commits in endpoints only release savepoints. No replica is
+configured, so within one request `deps.get_read_session` returns the
+`deps.get_session` session, sibling sessions on the same connection would roll
+back each other's work.
+
+With pytest-xdist (`pytest -n auto`) every worker uses its own database,
+`TEST_DATABASE_DB` suffixed with the worker id, created when missing.
+"""
 import asyncio
+import os
+import uuid
 from collections.abc import AsyncGenerator
 
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
-from sqlalchemy import delete, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
-from app.core import config, security
-from app.core.session import async_engine, async_session
-from app.main import app
-from app.models import Base, User
+from app.core import config
+
+# must happen before anything creates the engine from settings
+base_test_database_uri = config.settings.TEST_SQLALCHEMY_DATABASE_URI
+xdist_worker = os.environ.get("PYTEST_XDIST_WORKER")
+if xdist_worker:
+    config.settings = config.Settings(  # type: ignore
+        TEST_DATABASE_DB=f"{config.settings.TEST_DATABASE_DB}_{xdist_worker}"
+    )
+
+from app.api import deps  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.session import async_engine, async_session  # noqa: E402
+from app.main import app, rate_limit_backend  # noqa: E402
+from app.models import Base, User  # noqa: E402
 
 default_user_id = "b75365d9-7bf9-4f54-add5-aeab333a087b"
 default_user_email = "geralt@wiedzmin.pl"
@@ -29,10 +56,25 @@ def event_loop():
     loop.close()
 
 
+async def create_worker_database() -> None:
+    engine = create_async_engine(base_test_database_uri, isolation_level="AUTOCOMMIT")
+    database = config.settings.TEST_DATABASE_DB
+    async with engine.connect() as conn:
+        exists = await conn.scalar(
+            text("SELECT 1 FROM pg_database WHERE datname = :database"),
+            {"database": database},
+        )
+        if not exists:
+            await conn.execute(text(f'CREATE DATABASE "{database}"'))
+    await engine.dispose()
+
+
 @pytest_asyncio.fixture(scope="session")
 async def test_db_setup_sessionmaker():
     # assert if we use TEST_DB URL for 100%
     assert config.settings.ENVIRONMENT == "PYTEST"
+    if xdist_worker:
+        await create_worker_database()
 
     # always drop and create test db tables between tests session
     async with async_engine.begin() as conn:
@@ -40,15 +82,32 @@ async def test_db_setup_sessionmaker():
         await conn.run_sync(Base.metadata.create_all)
 
 
-@pytest_asyncio.fixture(autouse=True)
-async def session(test_db_setup_sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+async def get_test_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
 
-        # delete all data from all tables after test
-        for name, table in Base.metadata.tables.items():
-            await session.execute(delete(table))
-        await session.commit()
+
+@pytest_asyncio.fixture(autouse=True)
+async def session(test_db_setup_sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+    # rows are rolled back between tests behind the cache's back
+    deps.token_cache.clear()
+    await rate_limit_backend.clear()
+    app.dependency_overrides[deps.get_session] = get_test_session
+
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        async_session.configure(
+            bind=connection, join_transaction_mode="create_savepoint"
+        )
+        try:
+            async with async_session() as session:
+                yield session
+        finally:
+            async_session.configure(
+                bind=async_engine, join_transaction_mode="conservative_rollback"
+            )
+            app.dependency_overrides.clear()
+            await transaction.rollback()
 
 
 @pytest_asyncio.fixture(scope="session")
@@ -59,7 +118,7 @@ async def client() -> AsyncGenerator[AsyncClient, None]:
 
 
 @pytest_asyncio.fixture
-async def default_user(test_db_setup_sessionmaker) -> User:
+async def default_user(session: AsyncSession) -> User:
     async with async_session() as session:
         result = await session.execute(
             select(User).where(User.email == default_user_email)
@@ -70,7 +129,7 @@ async def default_user(test_db_setup_sessionmaker) -> User:
                 email=default_user_email,
                 hashed_password=default_user_password_hash,
             )
-            new_user.id = default_user_id
+            new_user.id = uuid.UUID(default_user_id)
             session.add(new_user)
             await session.commit()
             await session.refresh(new_user)
@@ -81,3 +140,17 @@ async def default_user(test_db_setup_sessionmaker) -> User:
 @pytest.fixture
 def default_user_headers(default_user: User):
     return {"Authorization": f"Bearer {default_user_access_token}"}
+
+
+@pytest_asyncio.fixture
+async def superuser_headers(session: AsyncSession) -> dict[str, str]:
+    superuser = User(
+        email=config.settings.FIRST_SUPERUSER_EMAIL,
+        hashed_password=default_user_password_hash,
+    )
+    session.add(superuser)
+    await session.commit()
+    access_token = security.create_jwt_token(
+        str(superuser.id), 60 * 60 * 24, refresh=False
+    )[0]
+    return {"Authorization": f"Bearer {access_token}"}
@@ -1,5 +1,7 @@
+import pytest
 from httpx import AsyncClient
 
+from app.core import config, security
 from app.main import app
 from app.models import User
 from app.tests.conftest import default_user_email, default_user_password
@@ -25,6 +27,45 @@ async def test_auth_access_token(client: AsyncClient, default_user: User):
     assert "refresh_token_issued_at" in token
 
 
+async def test_auth_access_token_fast_json(
+    client: AsyncClient, default_user: User, monkeypatch
+):
+    async def login():
+        response = await client.post(
+            app.url_path_for("login_access_token"),
+            data={
+                "username": default_user_email,
+                "password": default_user_password,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    generic = await login()
+    monkeypatch.setattr(config.settings, "FAST_JSON_RESPONSES", True)
+    fast = await login()
+    # tokens differ per call, field names, order and types must not
+    assert [(name, type(value)) for name, value in fast.items()] == [
+        (name, type(value)) for name, value in generic.items()
+    ]
+    assert fast["token_type"] == generic["token_type"]
+
+
+async def test_auth_access_token_email_case_insensitive(
+    client: AsyncClient, default_user: User
+):
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={
+            "username": default_user_email.upper(),
+            "password": default_user_password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert response.status_code == 200
+
+
 async def test_auth_access_token_fail_no_user(client: AsyncClient):
     response = await client.post(
         app.url_path_for("login_access_token"),
@@ -39,6 +80,42 @@ async def test_auth_access_token_fail_no_user(client: AsyncClient):
     assert response.json() == {"detail": "Incorrect email or password"}
 
 
+async def test_auth_access_token_fail_rate_limited(client: AsyncClient):
+    for _ in range(config.settings.RATE_LIMIT_EMAIL_BURST):
+        response = await client.post(
+            app.url_path_for("login_access_token"),
+            data={"username": "xxx@example.com", "password": "yyy"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        assert response.status_code == 400
+
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={"username": "XXX@example.com", "password": "yyy"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+async def test_auth_access_token_fail_hashing_overloaded(
+    client: AsyncClient, default_user: User, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(security.PWD_POOL, "max_pending", 0)
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={
+            "username": default_user_email,
+            "password": default_user_password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json() == {"detail": "Server is busy, try again later"}
+
+
 async def test_auth_refresh_token(client: AsyncClient, default_user: User):
     response = await client.post(
         app.url_path_for("login_access_token"),
@@ -62,3 +139,51 @@ async def test_auth_refresh_token(client: AsyncClient, default_user: User):
     assert "refresh_token" in token
     assert "refresh_token_expires_at" in token
     assert "refresh_token_issued_at" in token
+
+
+async def test_auth_refresh_token_fail_reused(client: AsyncClient, default_user: User):
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={
+            "username": default_user_email,
+            "password": default_user_password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    refresh_token = response.json()["refresh_token"]
+
+    first_response = await client.post(
+        app.url_path_for("refresh_token"), json={"refresh_token": refresh_token}
+    )
+    assert first_response.status_code == 200
+
+    second_response = await client.post(
+        app.url_path_for("refresh_token"), json={"refresh_token": refresh_token}
+    )
+    assert second_response.status_code == 403
+    assert second_response.json() == {
+        "detail": "Could not validate credentials, token revoked"
+    }
+
+
+async def test_auth_revoke_token(client: AsyncClient, default_user: User):
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={
+            "username": default_user_email,
+            "password": default_user_password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    access_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = await client.get(app.url_path_for("read_current_user"), headers=headers)
+    assert response.status_code == 200
+
+    response = await client.post(
+        app.url_path_for("revoke_token"), json={"token": access_token}
+    )
+    assert response.status_code == 204
+
+    response = await client.get(app.url_path_for("read_current_user"), headers=headers)
+    assert response.status_code == 403
@@ -0,0 +1,43 @@
+import asyncio
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.core import security
+
+spec = importlib.util.spec_from_file_location(
+    "gunicorn_conf", Path(__file__).parents[2] / "gunicorn.conf.py"
+)
+gunicorn_conf = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gunicorn_conf)
+
+
+def test_post_fork_hashing_pool_works_in_worker(monkeypatch):
+    pool = security.PasswordHashingPool(
+        lambda: ProcessPoolExecutor(max_workers=1), max_pending=4
+    )
+    monkeypatch.setattr(security, "PWD_POOL", pool)
+    # the master used its pool before forking, as with preload_app
+    asyncio.run(security.get_password_hash_async("password"))
+
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            gunicorn_conf.post_fork(None, None)
+
+            async def hash_in_worker() -> str:
+                return await asyncio.wait_for(
+                    security.get_password_hash_async("password"), timeout=10
+                )
+
+            hashed = asyncio.run(hash_in_worker())
+            pool.shutdown()
+            exit_code = 0 if security.verify_password("password", hashed) else 1
+        finally:
+            os._exit(exit_code)
+
+    _, status = os.waitpid(pid, 0)
+    pool.shutdown()
+    assert os.waitstatus_to_exitcode(status) == 0
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from app.core import config
+from app.main import app, load_openapi_schema
+
+
+@pytest.fixture
+def stale_schema_path(tmp_path, monkeypatch):
+    path = tmp_path / "openapi.json"
+    path.write_text(json.dumps({"openapi": "3.0.2", "info": {"version": app.version}}))
+    monkeypatch.setattr(config.settings, "OPENAPI_SCHEMA_PATH", str(path))
+    monkeypatch.setattr(app, "openapi_schema", None)
+    return path
+
+
+def test_openapi_schema_file_ignored_by_default(stale_schema_path):
+    load_openapi_schema()
+    assert "paths" in app.openapi_schema
+
+
+def test_openapi_schema_file_loaded_when_prebuilt(stale_schema_path, monkeypatch):
+    monkeypatch.setattr(config.settings, "OPENAPI_SCHEMA_PREBUILT", True)
+    load_openapi_schema()
+    assert "paths" not in app.openapi_schema
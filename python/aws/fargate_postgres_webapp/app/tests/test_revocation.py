@@ -0,0 +1,22 @@
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.revocation import RevocationList
+from app.models import RevokedToken
+
+
+async def test_sync_picks_up_late_committing_row(session: AsyncSession):
+    revocations = RevocationList(bits=1024, hashes=3, sync_overlap=60)
+    now = int(time.time())
+    session.add(RevokedToken(jti="early", expires_at=now + 600, revoked_at=now))
+    await session.commit()
+    await revocations.sync(session)
+    assert revocations.might_be_revoked("early")
+
+    # revoked before the last synced row, but committed after the sync ran
+    session.add(RevokedToken(jti="late", expires_at=now + 600, revoked_at=now - 5))
+    await session.commit()
+    assert not revocations.might_be_revoked("late")
+    await revocations.sync(session)
+    assert revocations.might_be_revoked("late")
@@ -0,0 +1,64 @@
+"""
+`UserLoader` opens its own transaction on `async_engine`, like `init.sh` runs
+it, outside the test's rolled back transaction, so loaded rows are deleted
+after every test here.
+"""
+from collections.abc import AsyncGenerator
+
+import pytest_asyncio
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import initial_data
+from app.core import config, security
+from app.core.seeding import UserLoader, generate_users
+from app.core.session import async_engine
+from app.models import User
+from app.tests.conftest import default_user_email, default_user_password_hash
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def delete_loaded_users() -> AsyncGenerator[None, None]:
+    yield
+    async with async_engine.begin() as conn:
+        await conn.execute(delete(User))
+
+
+async def test_user_loader_is_idempotent(session: AsyncSession):
+    rows = [
+        {"email": default_user_email, "hashed_password": default_user_password_hash},
+        *generate_users(10, "password"),
+    ]
+
+    report = await UserLoader(batch_size=4).load(rows)
+    assert report.rows == 11
+    assert report.inserted == 11
+    assert report.hashed == 1
+
+    report = await UserLoader(batch_size=4).load(rows)
+    assert report.inserted == 0
+
+    count = await session.scalar(select(func.count()).select_from(User))
+    assert count == 11
+
+
+async def test_user_loader_hashes_distinct_passwords(session: AsyncSession):
+    rows = [*generate_users(3, "password"), {"email": "a@x.com", "password": "other"}]
+
+    report = await UserLoader(hash_workers=2).load(rows)
+    assert report.hashed == 2
+
+    user = await session.scalar(select(User).where(User.email == "a@x.com"))
+    assert security.verify_password("other", user.hashed_password)
+
+
+async def test_initial_data(session: AsyncSession):
+    await initial_data.main(generate=3)
+
+    emails = await session.scalars(select(User.email).order_by(User.email))
+    assert emails.all() == sorted(
+        [
+            config.settings.FIRST_SUPERUSER_EMAIL,
+            *(f"user{i}@example.com" for i in range(3)),
+        ]
+    )
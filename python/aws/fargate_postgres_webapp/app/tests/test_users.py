@@ -1,7 +1,9 @@
 from httpx import AsyncClient
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api import deps
+from app.core import config, security
 from app.main import app
 from app.models import User
 from app.tests.conftest import (
@@ -22,6 +24,20 @@ async def test_read_current_user(client: AsyncClient, default_user_headers):
     }
 
 
+async def test_read_current_user_fast_json(
+    client: AsyncClient, default_user_headers, monkeypatch
+):
+    generic = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    monkeypatch.setattr(config.settings, "FAST_JSON_RESPONSES", True)
+    fast = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert fast.status_code == 200
+    assert fast.content == generic.content
+
+
 async def test_delete_current_user(
     client: AsyncClient, default_user_headers, session: AsyncSession
 ):
@@ -34,6 +50,46 @@ async def test_delete_current_user(
     assert user is None
 
 
+async def test_read_current_user_server_timing(
+    client: AsyncClient, default_user_headers
+):
+    response = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert 'desc="1 queries"' in response.headers["Server-Timing"]
+
+
+async def test_read_current_user_is_cached(client: AsyncClient, default_user_headers):
+    await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert len(deps.token_cache) == 1
+
+    response = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"id": default_user_id, "email": default_user_email}
+
+
+async def test_delete_current_user_invalidates_cache(
+    client: AsyncClient, default_user_headers
+):
+    await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    await client.delete(
+        app.url_path_for("delete_current_user"), headers=default_user_headers
+    )
+    assert len(deps.token_cache) == 0
+
+    response = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert response.status_code == 404
+
+
 async def test_reset_current_user_password(
     client: AsyncClient, default_user_headers, session: AsyncSession
 ):
@@ -64,3 +120,102 @@ async def test_register_new_user(
     result = await session.execute(select(User).where(User.email == "qwe@example.com"))
     user = result.scalars().first()
     assert user is not None
+
+
+async def test_register_new_user_email_taken_case_insensitive(
+    client: AsyncClient, default_user_headers
+):
+    response = await client.post(
+        app.url_path_for("register_new_user"),
+        headers=default_user_headers,
+        json={
+            "email": default_user_email.upper(),
+            "password": "asdasdasd",
+        },
+    )
+    assert response.status_code == 400
+
+
+async def test_read_users(client: AsyncClient, default_user_headers):
+    response = await client.get(
+        app.url_path_for("read_users"),
+        headers=default_user_headers,
+        params={"ids": [default_user_id, "00000000-0000-0000-0000-000000000000"]},
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"id": default_user_id, "email": default_user_email}]
+
+
+async def test_bulk_register_new_users(
+    client: AsyncClient, default_user, superuser_headers, session: AsyncSession
+):
+    response = await client.post(
+        app.url_path_for("bulk_register_new_users"),
+        headers=superuser_headers,
+        json={
+            "users": [
+                {"email": "qwe@example.com", "password": "asdasdasd"},
+                {"email": default_user_email, "password": "asdasdasd"},
+                {"email": "qwe@example.com", "password": "zxczxczxc"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [
+        "created",
+        "exists",
+        "duplicate",
+    ]
+    result = await session.execute(select(User).where(User.email == "qwe@example.com"))
+    user = result.scalars().first()
+    assert user is not None
+    assert results[0]["id"] == str(user.id)
+
+
+async def test_bulk_register_new_users_requires_superuser(
+    client: AsyncClient, default_user_headers
+):
+    response = await client.post(
+        app.url_path_for("bulk_register_new_users"),
+        headers=default_user_headers,
+        json={"users": [{"email": "qwe@example.com", "password": "asdasdasd"}]},
+    )
+    assert response.status_code == 403
+
+
+async def test_bulk_register_new_users_at_cap(
+    client: AsyncClient, superuser_headers, session: AsyncSession, monkeypatch
+):
+    # bcrypt would take minutes, the batch is about the INSERT chunks
+    monkeypatch.setattr(security, "get_password_hash", lambda password: password)
+    users = [
+        {"email": f"user{i}@example.com", "password": "asdasdasd"}
+        for i in range(config.settings.USERS_BULK_REGISTER_MAX_ITEMS)
+    ]
+    response = await client.post(
+        app.url_path_for("bulk_register_new_users"),
+        headers=superuser_headers,
+        json={"users": users},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(users)
+    assert {result["status"] for result in results} == {"created"}
+    count = await session.scalar(
+        select(func.count()).where(User.email.like("user%@example.com"))
+    )
+    assert count == len(users)
+
+
+async def test_bulk_register_new_users_too_many(client: AsyncClient, superuser_headers):
+    users = [
+        {"email": f"user{i}@example.com", "password": "asdasdasd"}
+        for i in range(config.settings.USERS_BULK_REGISTER_MAX_ITEMS + 1)
+    ]
+    response = await client.post(
+        app.url_path_for("bulk_register_new_users"),
+        headers=superuser_headers,
+        json={"users": users},
+    )
+    assert response.status_code == 422
@@ -0,0 +1,116 @@
+"""
+Measures login email lookup latency on a large `user_model` table.
+
+Seeds `--rows` users (10M by default, sharing one password hash) with
+`UserLoader`, then times the lookup `login_access_token` runs, on one pooled
+session, in three index setups:
+
+- before, `email = :email` on the old case-sensitive unique index on email
+- before, `lower(email) = :email` without an index on lower(email), what a
+  case-insensitive login cost before the migration (sequential scan)
+- after, `lower(email) = :email` on `ix_user_model_email_lower`
+
+Runs against the test database (see `.env`), seeding 10M rows takes minutes:
+
+python -m benchmarks.email_lookup --rows 10000000 --lookups 2000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import func, select, text
+
+from benchmarks.harness import percentile
+from benchmarks.inprocess import (
+    User,
+    async_engine,
+    async_session,
+    security,
+    setup_database,
+)
+
+# after `benchmarks.inprocess`, which selects the test database
+from app.core.seeding import UserLoader  # isort: skip
+
+DOMAIN = "example.com"
+
+
+async def seed(rows: int) -> None:
+    await setup_database()
+    hashed_password = security.get_password_hash("bench-password")
+    users = (
+        {"email": f"User{i}@{DOMAIN}", "hashed_password": hashed_password}
+        for i in range(rows)
+    )
+    report = await UserLoader(batch_size=200_000).load(users)
+    print(f"seeded {report}")
+    async with async_engine.begin() as conn:
+        await conn.execute(text(f"ANALYZE {User.__tablename__}"))
+
+
+async def set_indexes(old: bool, lower: bool) -> None:
+    table = User.__tablename__
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DROP INDEX IF EXISTS ix_user_model_email"))
+        await conn.execute(text("DROP INDEX IF EXISTS ix_user_model_email_lower"))
+        if old:
+            await conn.execute(
+                text(f"CREATE UNIQUE INDEX ix_user_model_email ON {table} (email)")
+            )
+        if lower:
+            await conn.execute(
+                text(
+                    "CREATE UNIQUE INDEX ix_user_model_email_lower "
+                    f"ON {table} (lower(email))"
+                )
+            )
+
+
+async def measure(name: str, make_query, emails: list[str]) -> None:
+    latencies: list[float] = []
+    async with async_session() as session:
+        for email in emails:
+            start = time.perf_counter()
+            user = (await session.execute(make_query(email))).scalars().first()
+            latencies.append(time.perf_counter() - start)
+            assert user is not None, email
+    print(
+        f"{name:<45} p50 {percentile(latencies, 50) * 1000:8.2f}ms  "
+        f"p99 {percentile(latencies, 99) * 1000:8.2f}ms"
+    )
+
+
+async def run(rows: int, lookups: int, skip_seed: bool) -> None:
+    if not skip_seed:
+        await seed(rows)
+    emails = [f"User{random.randrange(rows)}@{DOMAIN}" for _ in range(lookups)]
+
+    def exact(email: str):
+        return select(User).where(User.email == email)
+
+    def lowered(email: str):
+        return select(User).where(func.lower(User.email) == email.lower())
+
+    await set_indexes(old=True, lower=False)
+    await measure("before: email = :email (case-sensitive)", exact, emails)
+    # sequential scans, a few lookups are enough
+    await measure("before: lower(email) = :email (no index)", lowered, emails[:20])
+    await set_indexes(old=False, lower=True)
+    await measure("after: lower(email) = :email", lowered, emails)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument(
+        "--skip-seed", action="store_true", help="reuse rows seeded by previous run"
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.lookups, args.skip_seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Generic async load generator used by the scripts in this package.
+
+`run_load` sends `requests` requests built by `make_request` from `concurrency`
+workers sharing one client, and collects latency percentiles, throughput and
+status codes. Results are saved as JSON baselines and compared with
+`compare_to_baseline`, which lists metrics that regressed more than allowed.
+"""
+
+import asyncio
+import json
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import httpx
+
+RequestFactory = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def percentile(samples: list[float], pct: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+@dataclass
+class LoadResult:
+    requests: int
+    concurrency: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    status_codes: dict[str, int] = field(default_factory=dict)
+    # None when the app runs out of process and queries can't be counted
+    queries_per_request: float | None = None
+
+    def __str__(self) -> str:
+        queries = (
+            "-"
+            if self.queries_per_request is None
+            else f"{self.queries_per_request:.2f}"
+        )
+        return (
+            f"{self.throughput:8.1f} req/s  p50 {self.p50_ms:7.1f}ms  "
+            f"p95 {self.p95_ms:7.1f}ms  p99 {self.p99_ms:7.1f}ms  "
+            f"queries/req {queries}  {self.status_codes}"
+        )
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    make_request: RequestFactory,
+    requests: int,
+    concurrency: int,
+) -> LoadResult:
+    latencies: list[float] = []
+    status_codes: dict[str, int] = {}
+    numbers = iter(range(requests))
+
+    async def worker() -> None:
+        for number in numbers:
+            start = time.perf_counter()
+            response = await make_request(client, number)
+            latencies.append(time.perf_counter() - start)
+            code = str(response.status_code)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    return LoadResult(
+        requests=requests,
+        concurrency=concurrency,
+        seconds=seconds,
+        throughput=requests / seconds,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p95_ms=percentile(latencies, 95) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        status_codes=dict(sorted(status_codes.items())),
+    )
+
+
+def save_baseline(path: Path, results: dict[str, LoadResult]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {name: asdict(result) for name, result in results.items()}
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def compare_to_baseline(
+    path: Path, results: dict[str, LoadResult], max_regression: float
+) -> list[str]:
+    """Returns descriptions of metrics worse than baseline by more than
+    `max_regression` (0.2 = 20%), query counts must not grow at all"""
+    baseline = json.loads(path.read_text())
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if result.throughput < old["throughput"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: throughput {old['throughput']:.1f} -> {result.throughput:.1f} req/s"
+            )
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if getattr(result, metric) > old[metric] * (1 + max_regression):
+                regressions.append(
+                    f"{name}: {metric} {old[metric]:.1f} -> {getattr(result, metric):.1f}"
+                )
+        if (
+            result.queries_per_request is not None
+            and old.get("queries_per_request") is not None
+            and result.queries_per_request > old["queries_per_request"] + 0.01
+        ):
+            regressions.append(
+                f"{name}: queries/req {old['queries_per_request']:.2f} "
+                f"-> {result.queries_per_request:.2f}"
+            )
+    return regressions
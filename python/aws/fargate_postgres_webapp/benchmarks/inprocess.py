@@ -0,0 +1,55 @@
+"""
+In-process app setup shared by the benchmarks, import it before anything
+from `app`. Uses the test database (see `.env`), same as `app/conftest.py`,
+and disables rate limiting so that load from one client isn't throttled.
+"""
+
+import os
+
+os.environ["ENVIRONMENT"] = "PYTEST"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from httpx import AsyncClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.core.session import async_engine, async_session  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Base, User  # noqa: E402
+
+BENCH_USER_EMAIL = "bench@example.com"
+BENCH_USER_PASSWORD = "bench-password"
+
+
+class QueryCounter:
+    """Counts statements executed by `async_engine`"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        event.listen(
+            async_engine.sync_engine, "before_cursor_execute", self._on_execute
+        )
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+async def setup_database() -> str:
+    """Recreates tables and returns id of the benchmark user"""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as session:
+        user = User(
+            email=BENCH_USER_EMAIL,
+            hashed_password=security.get_password_hash(BENCH_USER_PASSWORD),
+        )
+        session.add(user)
+        await session.commit()
+        return str(user.id)
+
+
+def create_client() -> AsyncClient:
+    client = AsyncClient(app=app, base_url="http://test")
+    client.headers.update({"Host": "localhost"})
+    return client
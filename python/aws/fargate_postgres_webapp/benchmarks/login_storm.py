@@ -0,0 +1,88 @@
+"""
+Measures `/users/me` latency while a storm of logins is running.
+
+Every login costs one bcrypt verification (~0.3s for 12 rounds). Before the
+hashing pool was introduced, that call blocked the event loop and `/users/me`
+p99 latency grew with every concurrent login. With the pool it should stay
+close to the idle baseline, and overflowing logins get a fast 503.
+
+Runs the ASGI app in-process against the test database (see `.env`):
+
+python -m benchmarks.login_storm --logins 16 --readers 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from httpx import AsyncClient
+
+from benchmarks.harness import percentile
+from benchmarks.inprocess import (
+    BENCH_USER_EMAIL,
+    BENCH_USER_PASSWORD,
+    app,
+    create_client,
+    security,
+    setup_database,
+)
+
+
+async def login_worker(client: AsyncClient, deadline: float, codes: dict[int, int]):
+    while time.perf_counter() < deadline:
+        response = await client.post(
+            app.url_path_for("login_access_token"),
+            data={"username": BENCH_USER_EMAIL, "password": BENCH_USER_PASSWORD},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+
+async def reader_worker(
+    client: AsyncClient, deadline: float, headers: dict[str, str], latencies: list
+):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(
+            app.url_path_for("read_current_user"), headers=headers
+        )
+        assert response.status_code == 200, response.text
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(logins: int, readers: int, duration: float) -> None:
+    user_id = await setup_database()
+    access_token = security.create_jwt_token(user_id, 60 * 60, refresh=False)[0]
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    codes: dict[int, int] = {}
+    latencies: list[float] = []
+    async with create_client() as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(login_worker(client, deadline, codes) for _ in range(logins)),
+            *(
+                reader_worker(client, deadline, headers, latencies)
+                for _ in range(readers)
+            ),
+        )
+
+    print(f"hashing pool: {security.PWD_POOL.executor!r}")
+    print(f"login responses by status: {dict(sorted(codes.items()))}")
+    print(f"/users/me requests: {len(latencies)}")
+    for pct in (50, 95, 99):
+        print(f"/users/me p{pct}: {percentile(latencies, pct) * 1000:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=16, help="concurrent logins")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent readers")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.readers, args.duration))
+    security.PWD_POOL.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Load test suite, measures throughput, p50/p95/p99 latency and DB queries per
+request of the main endpoints, one endpoint at a time.
+
+In-process against the test database (see `.env`), queries are counted:
+
+python -m benchmarks.run --concurrency 20 --requests 2000
+
+Against a running server, e.g. `docker-compose -f docker-compose.dev.yml up`
+(disable RATE_LIMIT_ENABLED there, login scenarios come from one client):
+
+python -m benchmarks.run --base-url http://localhost
+
+Save results as a baseline and fail on regressions in later runs:
+
+python -m benchmarks.run --save-baseline benchmarks/baselines/local.json
+python -m benchmarks.run --compare benchmarks/baselines/local.json
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmarks.harness import LoadResult, compare_to_baseline, run_load, save_baseline
+
+BENCH_USER_EMAIL = "bench@example.com"
+BENCH_USER_PASSWORD = "bench-password"
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+async def login(client: httpx.AsyncClient) -> dict[str, str]:
+    response = await client.post(
+        "/auth/access-token",
+        data={"username": BENCH_USER_EMAIL, "password": BENCH_USER_PASSWORD},
+        headers=FORM_HEADERS,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def ensure_bench_user(client: httpx.AsyncClient) -> None:
+    response = await client.post(
+        "/users/register",
+        json={"email": BENCH_USER_EMAIL, "password": BENCH_USER_PASSWORD},
+    )
+    # 400 - already registered by a previous run
+    if response.status_code not in (200, 400):
+        response.raise_for_status()
+
+
+def scenarios(headers: dict[str, str], user_id: str, run_id: str) -> dict:
+    return {
+        "users_me": lambda client, _: client.get("/users/me", headers=headers),
+        "read_users": lambda client, _: client.get(
+            "/users", params={"ids": [user_id]}, headers=headers
+        ),
+        "access_token": lambda client, _: client.post(
+            "/auth/access-token",
+            data={"username": BENCH_USER_EMAIL, "password": BENCH_USER_PASSWORD},
+            headers=FORM_HEADERS,
+        ),
+        "register": lambda client, number: client.post(
+            "/users/register",
+            json={"email": f"bench-{run_id}-{number}@example.com", "password": "x"},
+        ),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, LoadResult]:
+    query_counter = None
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from benchmarks import inprocess
+
+        await inprocess.setup_database()
+        query_counter = inprocess.QueryCounter()
+        client = inprocess.create_client()
+
+    results: dict[str, LoadResult] = {}
+    async with client:
+        await ensure_bench_user(client)
+        headers = {"Authorization": f"Bearer {(await login(client))['access_token']}"}
+        user_id = (await client.get("/users/me", headers=headers)).json()["id"]
+
+        for name, make_request in scenarios(headers, user_id, uuid.uuid4().hex).items():
+            if args.scenario and name not in args.scenario:
+                continue
+            # bcrypt bound scenarios get a tenth of the requests
+            requests = (
+                args.requests // 10
+                if name in ("access_token", "register")
+                else args.requests
+            )
+            queries_before = query_counter.count if query_counter else 0
+            result = await run_load(client, make_request, requests, args.concurrency)
+            if query_counter:
+                result.queries_per_request = (
+                    query_counter.count - queries_before
+                ) / requests
+            results[name] = result
+            print(f"{name:14} {result}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", help="run against a server instead of in-process")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--scenario", action="append", help="run only given ones")
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--compare", type=Path, help="baseline to compare with")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="allowed, 0.2 = 20%%"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+    if args.compare:
+        regressions = compare_to_baseline(args.compare, results, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares FastAPI's generic response path (response_model validation +
+`jsonable_encoder` + `JSONResponse`) with the `BaseResponse.orjson_response`
+path that `/users/me` and `/auth/access-token` take with FAST_JSON_RESPONSES on.
+
+No database needed, both variants serve the same in-memory objects:
+
+python -m benchmarks.serialization --requests 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core import security
+from app.models import User
+from app.schemas.responses import AccessTokenResponse, UserResponse
+
+user = User(
+    id="b75365d9-7bf9-4f54-add5-aeab333a087b",
+    email="geralt@wiedzmin.pl",
+    hashed_password="",
+)
+token = security.generate_access_token_response(user.id)
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/generic/users/me", response_model=UserResponse)
+async def generic_user():
+    return user
+
+
+@bench_app.get("/fast/users/me", response_model=UserResponse)
+async def fast_user():
+    return UserResponse.orjson_response(user)
+
+
+@bench_app.get("/generic/auth/access-token", response_model=AccessTokenResponse)
+async def generic_token():
+    return token
+
+
+@bench_app.get("/fast/auth/access-token", response_model=AccessTokenResponse)
+async def fast_token():
+    return AccessTokenResponse.orjson_response(token)
+
+
+async def requests_per_second(client: AsyncClient, path: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path)
+        assert response.status_code == 200
+    return requests / (time.perf_counter() - start)
+
+
+async def run(requests: int) -> None:
+    async with AsyncClient(app=bench_app, base_url="http://test") as client:
+        for endpoint in ("/users/me", "/auth/access-token"):
+            generic = await requests_per_second(client, f"/generic{endpoint}", requests)
+            fast = await requests_per_second(client, f"/fast{endpoint}", requests)
+            print(
+                f"{endpoint:20} generic {generic:8.0f} req/s  "
+                f"fast {fast:8.0f} req/s  ({fast / generic - 1:+.0%})"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
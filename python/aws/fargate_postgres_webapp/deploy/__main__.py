@@ -6,6 +6,19 @@ import pulumi_awsx as awsx
 import pulumi_random as random
 import json
 
+# Serving profile, override with `pulumi config set <key> <value>`
+config = pulumi.Config()
+# Fargate CPU units (1024 = 1 vCPU) and MiB, must be a supported combination
+task_cpu = config.get_int("taskCpu") or 256
+task_memory = config.get_int("taskMemory") or 512
+# one gunicorn worker per whole vCPU, a fraction of vCPU still gets one
+web_concurrency = max(1, task_cpu // 1024)
+# app keep-alive is derived from it, see gunicorn.conf.py
+alb_idle_timeout = config.get_int("albIdleTimeout") or 60
+# in-flight requests get this long to finish on SIGTERM
+graceful_timeout = config.get_int("gracefulTimeout") or 25
+health_check_path = "/health"
+
 # We need to define a VPC with private and public subnets
 vpc = awsx.ec2.Vpc(
     "example-webapp-vpc",
@@ -113,6 +126,7 @@ alb = aws.lb.LoadBalancer(
     "example-webapp",
     security_groups=[lb_security_group.id],
     subnets=vpc.public_subnet_ids,
+    idle_timeout=alb_idle_timeout,
 )
 
 # create a target group, with
@@ -123,10 +137,17 @@ target_group = aws.lb.TargetGroup(
     protocol="HTTP",
     target_type="ip",
     vpc_id=vpc.vpc_id,
+    # ECS stops a task only after it's drained from the target group
+    deregistration_delay=graceful_timeout,
     health_check=aws.lb.TargetGroupHealthCheckArgs(
         port=8000,
         protocol="HTTP",
+        path=health_check_path,
         matcher="200-299", # required because of cors origin
+        interval=10,
+        timeout=5,
+        healthy_threshold=2,
+        unhealthy_threshold=3,
     ),
     opts=pulumi.ResourceOptions(parent=alb),
 )
@@ -190,8 +211,8 @@ task_definition = aws.ecs.TaskDefinition(
     "example-webapp",
     family="example-webapp",
     network_mode="awsvpc",
-    cpu="256",
-    memory="512",
+    cpu=str(task_cpu),
+    memory=str(task_memory),
     execution_role_arn=task_execution_role.arn,
     task_role_arn=task_execution_role.arn,
     requires_compatibilities=["FARGATE"],
@@ -236,8 +257,27 @@ task_definition = aws.ecs.TaskDefinition(
                     {
                         "name": "ALLOWED_HOSTS",
                         "value": pulumi.Output.json_dumps(default_allowed_hosts),
-                    }
+                    },
+                    {
+                        "name": "WEB_CONCURRENCY",
+                        "value": str(web_concurrency),
+                    },
+                    {
+                        "name": "ALB_IDLE_TIMEOUT_SECONDS",
+                        "value": str(alb_idle_timeout),
+                    },
+                    {
+                        "name": "GRACEFUL_TIMEOUT_SECONDS",
+                        "value": str(graceful_timeout),
+                    },
+                    {
+                        # only the load balancer can reach the tasks
+                        "name": "FORWARDED_ALLOW_IPS",
+                        "value": "*",
+                    },
                 ],
+                # SIGKILL after drain, a bit later than gunicorn gives up
+                "stopTimeout": graceful_timeout + 5,
                 "portMappings": [
                     {
                         "containerPort": 8000,
@@ -287,6 +327,8 @@ service = aws.ecs.Service(
     cluster=cluster.arn,
     desired_count=1,
     launch_type="FARGATE",
+    # init.sh runs migrations before the app starts listening
+    health_check_grace_period_seconds=60,
     task_definition=task_definition.arn,
     load_balancers=[
         aws.ecs.ServiceLoadBalancerArgs(
@@ -0,0 +1,78 @@
+"""
+Gunicorn config of the production container, see `Dockerfile`.
+
+Gunicorn manages uvicorn workers (uvloop, httptools): the app is imported once
+and forked (`preload_app`), and SIGTERM stops accepting connections and lets
+in-flight requests finish for up to GRACEFUL_TIMEOUT_SECONDS. Keep it below the
+ECS container `stopTimeout`, `deploy/__main__.py` sets both.
+
+Settings come from environment variables:
+
+WEB_CONCURRENCY            workers, defaults to CPUs allowed by the cgroup quota
+ALB_IDLE_TIMEOUT_SECONDS   load balancer idle timeout, keep-alive is 5s longer
+GRACEFUL_TIMEOUT_SECONDS   drain time on SIGTERM
+FORWARDED_ALLOW_IPS        proxies trusted for X-Forwarded-* (read by gunicorn)
+"""
+
+import math
+import os
+from pathlib import Path
+
+
+def cpu_limit() -> float:
+    """CPUs available to the container, cgroup v2 or v1 quota, else affinity"""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0))
+
+
+def default_workers() -> int:
+    # event loop workers are CPU bound, one per CPU, bcrypt runs on PWD_POOL
+    return max(1, math.ceil(cpu_limit()))
+
+
+bind = "0.0.0.0:8000"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY") or default_workers())
+preload_app = True
+
+# ALB closes idle connections after its idle timeout, the app must keep them
+# open longer, otherwise ALB may reuse a connection the app just closed (502)
+keepalive = int(os.environ.get("ALB_IDLE_TIMEOUT_SECONDS", "60")) + 5
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", "25"))
+# worker heartbeat, blocked event loop for longer than this restarts the worker
+timeout = 60
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # connections must not be shared with the parent, none are open after
+    # import, dispose anyway in case something connected while preloading
+    from app.core import security
+    from app.core.session import async_engine
+
+    async_engine.sync_engine.dispose(close=False)
+    # a process pool's management thread and queues don't survive the fork
+    security.PWD_POOL.after_fork()
+
+
+def when_ready(server):
+    server.log.info(
+        "Serving with %s workers, keepalive %ss, graceful timeout %ss",
+        workers,
+        keepalive,
+        graceful_timeout,
+    )
@@ -3,5 +3,7 @@
 echo "Run migrations"
 alembic upgrade head
 
+# Extra arguments are passed to the loader, e.g.
+# bash init.sh fixtures/users.csv --generate-users 1000000
 echo "Create initial data in DB"
-python -m app.initial_data
+python -m app.initial_data "$@"
@@ -16,6 +16,36 @@ def create_app():
         SECRET_KEY="secret",
         PROJECT_NAME="self-service-platyform",
         PULUMI_ORG=os.environ.get("PULUMI_ORG"),
+        # deployments running at once, more are queued
+        DEPLOYMENT_WORKERS=int(os.environ.get("DEPLOYMENT_WORKERS", 4)),
+        # queued deployments past this are rejected
+        MAX_QUEUED_DEPLOYMENTS=int(os.environ.get("MAX_QUEUED_DEPLOYMENTS", 20)),
+        # shared directory for per-stack lock files, for running several app
+        # processes, in-process locks only when unset
+        STACK_LOCK_DIR=os.environ.get("STACK_LOCK_DIR"),
+        # finished jobs kept for the status pages
+        JOB_HISTORY=int(os.environ.get("JOB_HISTORY", 100)),
+        # output lines and engine events kept per job, older ones are dropped
+        JOB_OUTPUT_LINES=int(os.environ.get("JOB_OUTPUT_LINES", 1000)),
+        # stack outputs shown in list views are refreshed this often
+        STACK_CACHE_REFRESH_SECONDS=int(
+            os.environ.get("STACK_CACHE_REFRESH_SECONDS", 30)
+        ),
+        # per-stack queries (each a `pulumi` subprocess) running at once
+        STACK_QUERY_CONCURRENCY=int(os.environ.get("STACK_QUERY_CONCURRENCY", 16)),
+        STACK_QUERY_TIMEOUT_SECONDS=int(
+            os.environ.get("STACK_QUERY_TIMEOUT_SECONDS", 60)
+        ),
+        # site content fetched from a URL, cached by ETag and Last-Modified,
+        # defaults to content-cache in the instance folder
+        CONTENT_CACHE_DIR=os.environ.get("CONTENT_CACHE_DIR"),
+        CONTENT_MAX_BYTES=int(os.environ.get("CONTENT_MAX_BYTES", 1024 * 1024)),
+        CONTENT_CONNECT_TIMEOUT_SECONDS=int(
+            os.environ.get("CONTENT_CONNECT_TIMEOUT_SECONDS", 5)
+        ),
+        CONTENT_READ_TIMEOUT_SECONDS=int(
+            os.environ.get("CONTENT_READ_TIMEOUT_SECONDS", 30)
+        ),
     )
 
     @app.route("/", methods=["GET"])
@@ -23,8 +53,22 @@ def create_app():
         """index page"""
         return render_template("index.html")
 
-    from . import sites
+    from . import jobs, locks, queries, stacks, workspaces
 
+    queries.queries.init_app(app)
+    locks.stack_locks.init_app(app)
+    workspaces.workspaces.init_app(app)
+    jobs.jobs.init_app(app)
+    app.register_blueprint(jobs.bp)
+    stacks.stacks.init_app(app)
+    # whatever a deployment did, the stack's cached outputs are stale
+    jobs.jobs.on_finished(
+        lambda job: job.stack_name and stacks.stacks.invalidate(job.stack_name)
+    )
+
+    from . import content, sites
+
+    content.content.init_app(app)
     app.register_blueprint(sites.bp)
 
     from . import databases
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ContentFetchError(Exception):
+    """raised with a user facing message when site content can't be fetched"""
+
+
+class ContentFetcher:
+    """fetches site content from a URL for `create_site` and `update_site`
+
+    Requests share one pooled session, have connect and read timeouts and
+    stop reading past CONTENT_MAX_BYTES. Responses with an ETag or
+    Last-Modified are cached in CONTENT_CACHE_DIR and revalidated, so fetching
+    an unchanged URL again costs a 304.
+    """
+
+    def __init__(self):
+        self.cache_dir = None
+        self.max_bytes = 1024 * 1024
+        self.timeout = (5, 30)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # guards the cache files of a URL fetched by two requests at once
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_dir = app.config["CONTENT_CACHE_DIR"] or os.path.join(
+            app.instance_path, "content-cache"
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = app.config["CONTENT_MAX_BYTES"]
+        self.timeout = (
+            app.config["CONTENT_CONNECT_TIMEOUT_SECONDS"],
+            app.config["CONTENT_READ_TIMEOUT_SECONDS"],
+        )
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        path = os.path.join(self.cache_dir, key)
+        return path + ".json", path + ".body"
+
+    def _cached(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, url, meta, body):
+        meta_path, body_path = self._paths(url)
+        # written to temp files and renamed, readers never see a partial entry
+        for path, data in ((body_path, body), (meta_path, json.dumps(meta).encode())):
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def _read_body(self, url, response):
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise ContentFetchError(
+                f"Content at '{url}' is larger than {self.max_bytes} bytes"
+            )
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) > self.max_bytes:
+                raise ContentFetchError(
+                    f"Content at '{url}' is larger than {self.max_bytes} bytes"
+                )
+        return bytes(body)
+
+    def fetch(self, url):
+        """text content of `url`, raises `ContentFetchError`"""
+        if urlparse(url).scheme not in ("http", "https"):
+            raise ContentFetchError(f"'{url}' is not an http or https URL")
+
+        with self._lock:
+            meta, cached_body = self._cached(url)
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with self._session.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            ) as response:
+                if response.status_code == 304 and meta is not None:
+                    return cached_body.decode(meta["encoding"], errors="replace")
+                if response.status_code != 200:
+                    raise ContentFetchError(
+                        f"Fetching '{url}' failed with HTTP {response.status_code}"
+                    )
+                body = self._read_body(url, response)
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "encoding": response.encoding or "utf-8",
+                }
+        except requests.RequestException as exn:
+            raise ContentFetchError(f"Fetching '{url}' failed: {exn}")
+
+        if meta["etag"] or meta["last_modified"]:
+            with self._lock:
+                self._store(url, meta, body)
+        return body.decode(meta["encoding"], errors="replace")
+
+
+content = ContentFetcher()
@@ -0,0 +1,377 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
+
+from .locks import StackLocked, stack_locks
+
+bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    """raised by job functions to fail with a user facing message"""
+
+
+class DeploymentQueueFull(Exception):
+    """raised by `JobManager.submit` when MAX_QUEUED_DEPLOYMENTS are waiting"""
+
+
+# longer output lines are cut, with JOB_OUTPUT_LINES this bounds job memory
+MAX_LINE_CHARS = 2000
+
+
+def _event_entry(event):
+    """plain dict of the engine events worth showing, None for the rest"""
+    step = (
+        event.resource_pre_event or event.res_outputs_event or event.res_op_failed_event
+    )
+    if step is not None:
+        if event.resource_pre_event:
+            state = "started"
+        elif event.res_outputs_event:
+            state = "done"
+        else:
+            state = "failed"
+        return {
+            "type": "resource",
+            "state": state,
+            "op": step.metadata.op.value,
+            "resource_type": step.metadata.type,
+            "urn": step.metadata.urn,
+        }
+    if event.diagnostic_event and event.diagnostic_event.severity in (
+        "warning",
+        "error",
+    ):
+        return {
+            "type": "diagnostic",
+            "severity": event.diagnostic_event.severity,
+            "urn": event.diagnostic_event.urn,
+            "message": event.diagnostic_event.message[:MAX_LINE_CHARS],
+        }
+    if event.summary_event:
+        return {
+            "type": "summary",
+            "resource_changes": dict(event.summary_event.resource_changes),
+            "duration_seconds": event.summary_event.duration_seconds,
+        }
+    return None
+
+
+class Job:
+    """a deployment running in the background, see `JobManager.submit`
+
+    Output lines (`log`) and engine events (`on_event`) go to one ring buffer
+    of `max_output` entries numbered from 0. Writers never block, viewers that
+    fall behind the oldest kept entry skip the lost ones.
+    """
+
+    def __init__(self, description, stack_name=None, max_output=1000):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.stack_name = stack_name
+        self.status = "queued"
+        self.progress = "waiting for a free worker"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # (seq, "log" or "event", line or event dict)
+        self.output = deque(maxlen=max_output)
+        self.next_seq = 0
+        self.resources_done = 0
+        # bumped on every change, viewers wait for it to move
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def _append(self, kind, data):
+        # caller holds self._changed
+        self.output.append((self.next_seq, kind, data))
+        self.next_seq += 1
+        self.version += 1
+        self._changed.notify_all()
+
+    def log(self, line):
+        """`on_output` callback for `stack.up` and `stack.destroy`"""
+        with self._changed:
+            self._append("log", line.rstrip("\n")[:MAX_LINE_CHARS])
+
+    def on_event(self, event):
+        """`on_event` callback, keeps resource steps, diagnostics and the summary"""
+        entry = _event_entry(event)
+        if entry is None:
+            return
+        with self._changed:
+            if entry["type"] == "resource":
+                if entry["state"] == "done":
+                    self.resources_done += 1
+                if entry["state"] == "started":
+                    self.progress = (
+                        f"{entry['op']} {entry['resource_type']}, "
+                        f"{self.resources_done} resources done"
+                    )
+            self._append("event", entry)
+
+    def set_progress(self, progress):
+        self._update(progress=progress)
+
+    def wait(self, version, timeout):
+        """blocks until the job changes after `version`, returns current version"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.version != version or self.finished, timeout=timeout
+            )
+            return self.version
+
+    def output_since(self, seq):
+        """(entries lost to the ring buffer, entries from `seq` on)"""
+        with self._changed:
+            entries = [entry for entry in self.output if entry[0] >= seq]
+            first = self.output[0][0] if self.output else self.next_seq
+        return max(0, first - seq), entries
+
+    def to_dict(self, since=-1):
+        """the job as JSON, with the output entries after sequence number `since`"""
+        skipped, entries = self.output_since(since + 1)
+        return {
+            "id": self.id,
+            "description": self.description,
+            "stack_name": self.stack_name,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "skipped": skipped,
+            "output": [
+                {"seq": seq, "kind": kind, "data": data} for seq, kind, data in entries
+            ],
+            "next_seq": self.next_seq,
+        }
+
+
+class JobManager:
+    """runs deployments on a bounded thread pool, so web workers return at once
+
+    At most DEPLOYMENT_WORKERS jobs run and MAX_QUEUED_DEPLOYMENTS wait, and a
+    stack has one job at a time (`stack_locks`). Submitting past either limit
+    raises right away, no `pulumi` process is started for it.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._finished_callbacks = []
+        self.max_history = 100
+        self.max_output = 1000
+        self.max_queued = 20
+
+    def init_app(self, app):
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["DEPLOYMENT_WORKERS"],
+            thread_name_prefix="deployment",
+        )
+        self.max_history = app.config["JOB_HISTORY"]
+        self.max_output = app.config["JOB_OUTPUT_LINES"]
+        self.max_queued = app.config["MAX_QUEUED_DEPLOYMENTS"]
+
+    def on_finished(self, callback):
+        """registers `callback(job)` called after every job, failed ones too
+
+        Callbacks run once the job has its final status, one raising is logged
+        and doesn't affect the job or the other callbacks.
+        """
+        self._finished_callbacks.append(callback)
+
+    def submit(self, description, func, stack_name=None):
+        """queues `func(job)` and returns the job without waiting for it
+
+        Raises `DeploymentQueueFull` or `StackLocked` instead of queueing.
+        """
+        job = Job(description, stack_name=stack_name, max_output=self.max_output)
+        with self._lock:
+            queued = sum(1 for other in self._jobs.values() if other.status == "queued")
+            if queued >= self.max_queued:
+                raise DeploymentQueueFull(
+                    f"{queued} deployments are already waiting, try again later"
+                )
+            if stack_name is not None:
+                stack_locks.acquire(stack_name, job.id)
+            self._jobs[job.id] = job
+            self._forget_finished()
+        try:
+            self._executor.submit(self._run, job, func)
+        except Exception:
+            # e.g. the executor is shut down, the job never runs to release it
+            with self._lock:
+                del self._jobs[job.id]
+            if stack_name is not None:
+                stack_locks.release(stack_name)
+            raise
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _forget_finished(self):
+        # oldest first, running and queued jobs are never dropped
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_history:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+
+    def _run(self, job, func):
+        job._update(status="running", progress="starting", started_at=time.time())
+        try:
+            try:
+                func(job)
+            except JobFailed as exn:
+                job._update(status="failed", error=str(exn), finished_at=time.time())
+            except Exception as exn:
+                job._update(status="failed", error=repr(exn), finished_at=time.time())
+            else:
+                job._update(
+                    status="succeeded", progress="done", finished_at=time.time()
+                )
+        finally:
+            # after the final status, so a `StackLocked` redirect never lands
+            # on a job that looks running while the next one can already start
+            if job.stack_name is not None:
+                stack_locks.release(job.stack_name)
+        for callback in self._finished_callbacks:
+            try:
+                callback(job)
+            except Exception:
+                logger.exception("on_finished callback failed for job %s", job.id)
+
+
+jobs = JobManager()
+
+
+def _get_or_404(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+
+@bp.app_errorhandler(StackLocked)
+def stack_locked(exn):
+    """sends the user to the deployment already running on the stack"""
+    flash(str(exn), category="danger")
+    if exn.job_id is not None:
+        return redirect(url_for("jobs.show_job", id=exn.job_id))
+    return redirect(request.referrer or url_for("index"))
+
+
+@bp.app_errorhandler(DeploymentQueueFull)
+def deployment_queue_full(exn):
+    flash(str(exn), category="danger")
+    return redirect(request.referrer or url_for("index"))
+
+
+@bp.route("/", methods=["GET"])
+def list_jobs():
+    """lists recent jobs"""
+    return render_template("jobs/index.html", jobs=jobs.recent())
+
+
+@bp.route("/<string:id>", methods=["GET"])
+def show_job(id: str):
+    """job status page, follows the event stream"""
+    return render_template("jobs/show.html", job=_get_or_404(id))
+
+
+@bp.route("/<string:id>/status", methods=["GET"])
+def job_status(id: str):
+    """job status for polling, `?since=N` returns the output entries after N
+
+    N is the sequence number of the last entry the client received.
+    """
+    job = _get_or_404(id)
+    return jsonify(job.to_dict(since=request.args.get("since", -1, type=int)))
+
+
+@bp.route("/<string:id>/events", methods=["GET"])
+def job_events(id: str):
+    """server-sent events tailing the job
+
+    `log` per output line, `engine` per engine event (JSON), `skipped` with
+    the count of entries lost to the ring buffer and `status` on every change.
+    Viewers only read the job's buffer, a slow one holds no extra memory.
+    """
+    job = _get_or_404(id)
+    # resume after the last entry the browser got before reconnecting
+    next_seq = request.headers.get("Last-Event-ID", -1, type=int) + 1
+
+    def stream():
+        nonlocal next_seq
+        version = None
+        sent_status = None
+        while True:
+            current = job.wait(version, timeout=15)
+            if current == version and not job.finished:
+                yield ": keep-alive\n\n"
+                continue
+            version = current
+            skipped, entries = job.output_since(next_seq)
+            if skipped:
+                yield f"event: skipped\ndata: {skipped}\n\n"
+            for seq, kind, data in entries:
+                if kind == "log":
+                    data = data.replace("\n", "\ndata: ")
+                    yield f"id: {seq}\nevent: log\ndata: {data}\n\n"
+                else:
+                    yield f"id: {seq}\nevent: engine\ndata: {json.dumps(data)}\n\n"
+                next_seq = seq + 1
+            status = {
+                "status": job.status,
+                "progress": job.progress,
+                "error": job.error,
+            }
+            if status != sent_status:
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+                sent_status = status
+            if job.finished and next_seq >= job.next_seq:
+                return
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,68 @@
+import fcntl
+import os
+import re
+import threading
+
+
+class StackLocked(Exception):
+    """raised when a stack already has a deployment queued or running"""
+
+    def __init__(self, message, job_id=None):
+        super().__init__(message)
+        # the job holding the lock, None when another process holds it
+        self.job_id = job_id
+
+
+class StackLocks:
+    """one deployment per stack, checked before a `pulumi` process is started
+
+    Locks are held from `JobManager.submit` until the job finishes. With
+    STACK_LOCK_DIR set, an exclusive `flock` on `<dir>/<stack>.lock` is held
+    too, so app processes sharing the directory don't deploy the same stack.
+    """
+
+    def __init__(self):
+        self.lock_dir = None
+        # stack name -> (job id, lock file descriptor or None)
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.lock_dir = app.config["STACK_LOCK_DIR"]
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _lock_file(self, stack_name):
+        if not self.lock_dir:
+            return None
+        file_name = re.sub(r"[^\w.-]", "_", stack_name) + ".lock"
+        fd = os.open(os.path.join(self.lock_dir, file_name), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise StackLocked(
+                f"Stack '{stack_name}' is being deployed by another process"
+            )
+        return fd
+
+    def acquire(self, stack_name, job_id):
+        """locks the stack for `job_id` or raises `StackLocked` at once"""
+        with self._lock:
+            held = self._held.get(stack_name)
+            if held is not None:
+                raise StackLocked(
+                    f"Stack '{stack_name}' already has a deployment in progress",
+                    job_id=held[0],
+                )
+            self._held[stack_name] = (job_id, self._lock_file(stack_name))
+
+    def release(self, stack_name):
+        with self._lock:
+            _, fd = self._held.pop(stack_name)
+        if fd is not None:
+            # closing the descriptor drops the flock
+            os.close(fd)
+
+
+stack_locks = StackLocks()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StackQueryTimeout(Exception):
+    """raised for a query that ran longer than STACK_QUERY_TIMEOUT_SECONDS"""
+
+
+class StackQueryError(Exception):
+    """raised when a query's `pulumi` command exits with an error"""
+
+
+class StackQueryPool:
+    """runs read-only per-stack queries (outputs, info) concurrently
+
+    Every query spawns a `pulumi` subprocess, so at most STACK_QUERY_CONCURRENCY
+    run at once. `run_pulumi` kills a subprocess running longer than
+    STACK_QUERY_TIMEOUT_SECONDS, and `run_all` reports a query that hasn't
+    finished that long after it was submitted as `StackQueryTimeout`, queued
+    or not.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self.timeout = 60
+
+    def init_app(self, app):
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["STACK_QUERY_CONCURRENCY"],
+            thread_name_prefix="stack-query",
+        )
+        self.timeout = app.config["STACK_QUERY_TIMEOUT_SECONDS"]
+
+    def run_pulumi(self, workspace, args):
+        """stdout of `pulumi <args>` run in the workspace, killed on timeout
+
+        The automation API's own commands can't be given a timeout, queries run
+        the CLI the same way `LocalWorkspace` does instead.
+        """
+        env = {**os.environ, **workspace.env_vars}
+        if workspace.pulumi_home:
+            env["PULUMI_HOME"] = workspace.pulumi_home
+        try:
+            # run() kills the process when the timeout expires
+            result = subprocess.run(
+                ["pulumi", *args, "--non-interactive"],
+                cwd=workspace.work_dir,
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise StackQueryTimeout(
+                f"'pulumi {' '.join(args)}' timed out after {self.timeout}s"
+            )
+        if result.returncode != 0:
+            raise StackQueryError(
+                f"'pulumi {' '.join(args)}' failed: {result.stderr.strip()}"
+            )
+        return result.stdout
+
+    def run_all(self, func, stack_names):
+        """calls `func(stack_name)` for every stack
+
+        Returns ({stack name: result}, {stack name: exception}).
+        """
+        deadline = time.monotonic() + self.timeout
+        futures = {
+            self._executor.submit(func, stack_name): stack_name
+            for stack_name in stack_names
+        }
+        results, errors = {}, {}
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(
+                pending, timeout=remaining, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                stack_name = futures[future]
+                try:
+                    results[stack_name] = future.result()
+                except Exception as exn:
+                    errors[stack_name] = exn
+        for future in pending:
+            # queued calls never start, running ones end with their subprocess
+            future.cancel()
+            stack_name = futures[future]
+            errors[stack_name] = StackQueryTimeout(
+                f"Querying stack '{stack_name}' timed out after {self.timeout}s"
+            )
+        return results, errors
+
+
+queries = StackQueryPool()
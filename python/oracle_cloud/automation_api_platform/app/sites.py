@@ -1,5 +1,4 @@
 import json
-import requests
 import pulumi_oci as oci
 from flask import (
     current_app,
@@ -14,6 +13,11 @@ from flask import (
 import pulumi
 import pulumi.automation as auto
 
+from .content import ContentFetchError, content
+from .jobs import JobFailed, jobs
+from .stacks import stacks
+from .workspaces import workspaces
+
 bp = Blueprint("sites", __name__, url_prefix="/sites")
 
 
@@ -34,30 +38,33 @@ def create_site():
         stack_name = request.form.get("site-id")
         file_url = request.form.get("file-url")
         if file_url:
-            site_content = requests.get(file_url).text
+            try:
+                site_content = content.fetch(file_url)
+            except ContentFetchError as exn:
+                flash(str(exn), category="danger")
+                return redirect(url_for("sites.create_site"))
         else:
             site_content = request.form.get("site-content")
 
         def pulumi_program():
             return create_pulumi_program(str(site_content))
 
-        try:
-            # create a new stack, generating our pulumi program on the fly from the POST body
-            stack = auto.create_stack(
-                stack_name=str(stack_name),
-                project_name=current_app.config["PROJECT_NAME"],
-                program=pulumi_program,
-            )
-            # deploy the stack, tailing the logs to stdout
-            stack.up(on_output=print)
-            flash(f"Successfully created site '{stack_name}'", category="success")
-        except auto.StackAlreadyExistsError:
-            flash(
-                f"Error: Site with name '{stack_name}' already exists, pick a unique name",
-                category="danger",
-            )
-
-        return redirect(url_for("sites.list_sites"))
+        def deploy(job):
+            with workspaces.lease(pulumi_program) as ws:
+                try:
+                    # create a new stack, generating our pulumi program on the fly from the POST body
+                    stack = auto.Stack.create(str(stack_name), ws)
+                except auto.StackAlreadyExistsError:
+                    raise JobFailed(
+                        f"Error: Site with name '{stack_name}' already exists, pick a unique name"
+                    )
+                job.set_progress("deploying")
+                # deploy the stack, tailing the logs to the job
+                stack.up(on_output=job.log, on_event=job.on_event)
+
+        job = jobs.submit(f"Create site '{stack_name}'", deploy, stack_name=stack_name)
+        flash(f"Creating site '{stack_name}'", category="info")
+        return redirect(url_for("jobs.show_job", id=job.id))
 
     return render_template("sites/create.html")
 
@@ -65,31 +72,21 @@ def create_site():
 @bp.route("/", methods=["GET"])
 def list_sites():
     """lists all sites"""
-    sites = []
     org_name = current_app.config["PULUMI_ORG"]
     project_name = current_app.config["PROJECT_NAME"]
-    try:
-        ws = auto.LocalWorkspace(
-            project_settings=auto.ProjectSettings(name=project_name, runtime="python")
-        )
-        all_stacks = ws.list_stacks()
-        for stack in all_stacks:
-            stack = auto.select_stack(
-                stack_name=stack.name,
-                project_name=project_name,
-                # no-op program, just to get outputs
-                program=lambda: None,
-            )
-            outs = stack.outputs()
-            sites.append(
-                {
-                    "name": stack.name,
-                    "url": f"http://{outs['website_url'].value}",
-                    "console_url": f"https://app.pulumi.com/{org_name}/{project_name}/{stack.name}",
-                }
-            )
-    except Exception as exn:
-        flash(str(exn), category="danger")
+    # rendered from memory, see `StackOutputsCache`
+    if not stacks.loaded:
+        flash("Sites are still loading, refresh in a moment", category="info")
+    if stacks.error:
+        flash(stacks.error, category="danger")
+    sites = [
+        {
+            "name": stack_name,
+            "url": f"http://{outs['website_url']}",
+            "console_url": f"https://app.pulumi.com/{org_name}/{project_name}/{stack_name}",
+        }
+        for stack_name, outs in stacks.with_output("website_url")
+    ]
 
     return render_template("sites/index.html", sites=sites)
 
@@ -101,63 +98,55 @@ def update_site(id: str):
     if request.method == "POST":
         file_url = request.form.get("file-url")
         if file_url:
-            site_content = requests.get(file_url).text
+            try:
+                site_content = content.fetch(file_url)
+            except ContentFetchError as exn:
+                flash(str(exn), category="danger")
+                return redirect(url_for("sites.update_site", id=stack_name))
         else:
             site_content = str(request.form.get("site-content"))
 
-        try:
-
-            def pulumi_program():
-                create_pulumi_program(str(site_content))
-
-            stack = auto.select_stack(
-                stack_name=stack_name,
-                project_name=current_app.config["PROJECT_NAME"],
-                program=pulumi_program,
-            )
-            # deploy the stack, tailing the logs to stdout
-            stack.up(on_output=print)
-            flash(f"Site '{stack_name}' successfully updated!", category="success")
-        except auto.ConcurrentUpdateError:
-            flash(
-                f"Error: site '{stack_name}' already has an update in progress",
-                category="danger",
-            )
-        except Exception as exn:
-            flash(str(exn), category="danger")
-        return redirect(url_for("sites.list_sites"))
-
-    stack = auto.select_stack(
-        stack_name=stack_name,
-        project_name=current_app.config["PROJECT_NAME"],
-        # noop just to get the outputs
-        program=lambda: None,
-    )
-    outs = stack.outputs()
-    content_output = outs.get("website_content")
-    content = content_output.value if content_output else None
-    return render_template("sites/update.html", name=stack_name, content=content)
+        def pulumi_program():
+            create_pulumi_program(str(site_content))
+
+        def deploy(job):
+            with workspaces.lease(pulumi_program) as ws:
+                stack = auto.Stack.select(stack_name, ws)
+                job.set_progress("deploying")
+                try:
+                    # deploy the stack, tailing the logs to the job
+                    stack.up(on_output=job.log, on_event=job.on_event)
+                except auto.ConcurrentUpdateError:
+                    raise JobFailed(
+                        f"Error: site '{stack_name}' already has an update in progress"
+                    )
+
+        job = jobs.submit(f"Update site '{stack_name}'", deploy, stack_name=stack_name)
+        flash(f"Updating site '{stack_name}'", category="info")
+        return redirect(url_for("jobs.show_job", id=job.id))
+
+    website_content = stacks.outputs(stack_name).get("website_content")
+    return render_template("sites/update.html", name=stack_name, content=website_content)
 
 
 @bp.route("/<string:id>/delete", methods=["POST"])
 def delete_site(id: str):
     stack_name = id
-    try:
-        stack = auto.select_stack(
-            stack_name=stack_name,
-            project_name=current_app.config["PROJECT_NAME"],
-            # noop program for destroy
-            program=lambda: None,
-        )
-        stack.destroy(on_output=print)
-        stack.workspace.remove_stack(stack_name)
-        flash(f"Site '{stack_name}' successfully deleted!", category="success")
-    except auto.ConcurrentUpdateError:
-        flash(
-            f"Error: Site '{stack_name}' already has update in progress",
-            category="danger",
-        )
-    except Exception as exn:
-        flash(str(exn), category="danger")
-
-    return redirect(url_for("sites.list_sites"))
+
+    def destroy(job):
+        # noop program for destroy
+        with workspaces.lease(lambda: None) as ws:
+            stack = auto.Stack.select(stack_name, ws)
+            job.set_progress("destroying")
+            try:
+                stack.destroy(on_output=job.log, on_event=job.on_event)
+            except auto.ConcurrentUpdateError:
+                raise JobFailed(
+                    f"Error: Site '{stack_name}' already has update in progress"
+                )
+            job.set_progress("removing stack")
+            ws.remove_stack(stack_name)
+
+    job = jobs.submit(f"Delete site '{stack_name}'", destroy, stack_name=stack_name)
+    flash(f"Deleting site '{stack_name}'", category="info")
+    return redirect(url_for("jobs.show_job", id=job.id))
@@ -0,0 +1,133 @@
+import json
+import threading
+
+import pulumi.automation as auto
+
+from .queries import queries
+
+
+class StackOutputsCache:
+    """outputs of every stack in the project, kept in memory for the list views
+
+    Listing stacks is one `pulumi` call, fetching outputs of a stack is
+    another, so outputs are cached per stack name and refetched only when the
+    stack's last update time changes, concurrently on the shared `queries`
+    pool. Every call is bounded by its timeout, a hung `pulumi` is killed. A
+    background thread refreshes the cache every STACK_CACHE_REFRESH_SECONDS,
+    `invalidate` refreshes it right away.
+    """
+
+    def __init__(self):
+        self.project_name = None
+        self.refresh_seconds = 30
+        self.loaded = False
+        self.error = None
+        self._workspace = None
+        # stack name -> (last update, {output name: value})
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def init_app(self, app):
+        self.project_name = app.config["PROJECT_NAME"]
+        self.refresh_seconds = app.config["STACK_CACHE_REFRESH_SECONDS"]
+        thread = threading.Thread(
+            target=self._refresh_forever, name="stack-cache", daemon=True
+        )
+        thread.start()
+
+    @property
+    def workspace(self):
+        # created lazily, constructing it runs `pulumi version`
+        if self._workspace is None:
+            self._workspace = auto.LocalWorkspace(
+                project_settings=auto.ProjectSettings(
+                    name=self.project_name, runtime="python"
+                )
+            )
+        return self._workspace
+
+    def _fetch_outputs(self, stack_name):
+        stdout = queries.run_pulumi(
+            self.workspace,
+            ["stack", "output", "--json", "--show-secrets", "--stack", stack_name],
+        )
+        return json.loads(stdout)
+
+    def refresh(self):
+        """syncs the cache with the stack list, fetching outputs of changed stacks"""
+        summaries = json.loads(
+            queries.run_pulumi(self.workspace, ["stack", "ls", "--json"])
+        )
+        with self._lock:
+            entries = dict(self._entries)
+        fresh = {}
+        changed = {}
+        for summary in summaries:
+            # lastUpdate is missing for stacks never deployed
+            name, last_update = summary["name"], summary.get("lastUpdate")
+            cached = entries.get(name)
+            if cached is not None and cached[0] == last_update:
+                fresh[name] = cached
+            else:
+                changed[name] = last_update
+
+        outputs, errors = queries.run_all(self._fetch_outputs, changed)
+        for stack_name, last_update in changed.items():
+            if stack_name in outputs:
+                fresh[stack_name] = (last_update, outputs[stack_name])
+            elif stack_name in entries:
+                # keep stale outputs, unknown last update retries next time
+                fresh[stack_name] = (None, entries[stack_name][1])
+        with self._lock:
+            self._entries = fresh
+            self.loaded = True
+        if errors:
+            raise RuntimeError(
+                "Failed to load outputs of "
+                + ", ".join(f"'{name}' ({exn})" for name, exn in sorted(errors.items()))
+            )
+
+    def _refresh_forever(self):
+        while True:
+            try:
+                self.refresh()
+                self.error = None
+            except Exception as exn:
+                self.error = str(exn)
+            self._wakeup.wait(timeout=self.refresh_seconds)
+            self._wakeup.clear()
+
+    def invalidate(self, stack_name):
+        """drops the stack's outputs and refreshes the cache in the background"""
+        with self._lock:
+            self._entries.pop(stack_name, None)
+        self._wakeup.set()
+
+    def outputs(self, stack_name):
+        """cached outputs of one stack, fetched and cached when missing"""
+        with self._lock:
+            cached = self._entries.get(stack_name)
+        if cached is not None:
+            return cached[1]
+        results, errors = queries.run_all(self._fetch_outputs, [stack_name])
+        if errors:
+            raise errors[stack_name]
+        outputs = results[stack_name]
+        with self._lock:
+            # unknown last update, next refresh fetches it again
+            self._entries.setdefault(stack_name, (None, outputs))
+        return outputs
+
+    def with_output(self, output_name):
+        """(stack name, outputs) of cached stacks exporting `output_name`"""
+        with self._lock:
+            entries = sorted(self._entries.items())
+        return [
+            (stack_name, outputs)
+            for stack_name, (_, outputs) in entries
+            if output_name in outputs
+        ]
+
+
+stacks = StackOutputsCache()
@@ -13,6 +13,10 @@ import requests
 import pulumi.automation as auto
 import pulumi
 
+from .jobs import JobFailed, jobs
+from .stacks import stacks
+from .workspaces import workspaces
+
 bp = Blueprint("vcns", __name__, url_prefix="/vcns")
 
 def create_pulumi_program(cidr_block: str):
@@ -35,23 +39,22 @@ def create_vcn():
         def pulumi_program():
             return create_pulumi_program(str(cidr_block))
 
-        try:
-            # create a new stack, generating our pulumi program on the fly from the POST body
-            stack = auto.create_stack(
-                stack_name=str(stack_name),
-                project_name=current_app.config["PROJECT_NAME"],
-                program=pulumi_program,
-            )
-            # deploy the stack, tailing the logs to stdout
-            stack.up(on_output=print)
-            flash(f"Successfully created site '{stack_name}'", category="success")
-        except auto.StackAlreadyExistsError:
-            flash(
-                f"Error: VCN with name '{stack_name}' already exists, pick a unique name",
-                category="danger",
-            )
-
-        return redirect(url_for("vcns.list_vcns"))
+        def deploy(job):
+            with workspaces.lease(pulumi_program) as ws:
+                try:
+                    # create a new stack, generating our pulumi program on the fly from the POST body
+                    stack = auto.Stack.create(str(stack_name), ws)
+                except auto.StackAlreadyExistsError:
+                    raise JobFailed(
+                        f"Error: VCN with name '{stack_name}' already exists, pick a unique name"
+                    )
+                job.set_progress("deploying")
+                # deploy the stack, tailing the logs to the job
+                stack.up(on_output=job.log, on_event=job.on_event)
+
+        job = jobs.submit(f"Create VCN '{stack_name}'", deploy, stack_name=stack_name)
+        flash(f"Creating VCN '{stack_name}'", category="info")
+        return redirect(url_for("jobs.show_job", id=job.id))
 
     return render_template("vcns/create.html")
 
@@ -59,31 +62,21 @@ def create_vcn():
 @bp.route("/", methods=["GET"])
 def list_vcns():
     """lists all vcns"""
-    vcns = []
     org_name = current_app.config["PULUMI_ORG"]
     project_name = current_app.config["PROJECT_NAME"]
-    try:
-        ws = auto.LocalWorkspace(
-            project_settings=auto.ProjectSettings(name=project_name, runtime="python")
-        )
-        all_stacks = ws.list_stacks()
-        for stack in all_stacks:
-            stack = auto.select_stack(
-                stack_name=stack.name,
-                project_name=project_name,
-                # no-op program, just to get outputs
-                program=lambda: None,
-            )
-            outs = stack.outputs()
-            vcns.append(
-                {
-                    "name": stack.name,
-                    "vcn_id": outs["vcn_id"].value,
-                    "console_url": f"https://app.pulumi.com/{org_name}/{project_name}/{stack.name}",
-                }
-            )
-    except Exception as exn:
-        flash(str(exn), category="danger")
+    # rendered from memory, see `StackOutputsCache`
+    if not stacks.loaded:
+        flash("VCNs are still loading, refresh in a moment", category="info")
+    if stacks.error:
+        flash(stacks.error, category="danger")
+    vcns = [
+        {
+            "name": stack_name,
+            "vcn_id": outs["vcn_id"],
+            "console_url": f"https://app.pulumi.com/{org_name}/{project_name}/{stack_name}",
+        }
+        for stack_name, outs in stacks.with_output("vcn_id")
+    ]
 
     return render_template("vcns/index.html", vcns=vcns)
 
@@ -91,25 +84,24 @@ def list_vcns():
 @bp.route("/<string:id>/delete", methods=["POST"])
 def delete_vcn(id: str):
     stack_name = id
-    try:
-        stack = auto.select_stack(
-            stack_name=stack_name,
-            project_name=current_app.config["PROJECT_NAME"],
-            # noop program for destroy
-            program=lambda: None,
-        )
-        stack.destroy(on_output=print)
-        stack.workspace.remove_stack(stack_name)
-        flash(f"VCN '{stack_name}' successfully deleted!", category="success")
-    except auto.ConcurrentUpdateError:
-        flash(
-            f"Error: Site '{stack_name}' already has update in progress",
-            category="danger",
-        )
-    except Exception as exn:
-        flash(str(exn), category="danger")
-
-    return redirect(url_for("vcns.list_vcns"))
+
+    def destroy(job):
+        # noop program for destroy
+        with workspaces.lease(lambda: None) as ws:
+            stack = auto.Stack.select(stack_name, ws)
+            job.set_progress("destroying")
+            try:
+                stack.destroy(on_output=job.log, on_event=job.on_event)
+            except auto.ConcurrentUpdateError:
+                raise JobFailed(
+                    f"Error: VCN '{stack_name}' already has update in progress"
+                )
+            job.set_progress("removing stack")
+            ws.remove_stack(stack_name)
+
+    job = jobs.submit(f"Delete VCN '{stack_name}'", destroy, stack_name=stack_name)
+    flash(f"Deleting VCN '{stack_name}'", category="info")
+    return redirect(url_for("jobs.show_job", id=job.id))
 
 
 
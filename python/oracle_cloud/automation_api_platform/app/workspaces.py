@@ -0,0 +1,57 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import pulumi.automation as auto
+
+
+class WorkspacePool:
+    """pre-initialised workspaces of the project, leased by deployments
+
+    Creating a `LocalWorkspace` (which `auto.create_stack` and
+    `auto.select_stack` do on every call) makes a temp project dir and probes
+    `pulumi version`. Pooled workspaces pay that once. A lease is exclusive,
+    `pulumi stack select` state lives in the workspace, and the inline program
+    is set on lease and cleared on return.
+    """
+
+    def __init__(self):
+        self.project_name = None
+        self.size = 4
+        self._idle = queue.LifoQueue()
+
+    def init_app(self, app):
+        self.project_name = app.config["PROJECT_NAME"]
+        # one per deployment worker, so a job never waits for a workspace
+        self.size = app.config["DEPLOYMENT_WORKERS"]
+        thread = threading.Thread(target=self._warm, name="workspace-pool", daemon=True)
+        thread.start()
+
+    def _create(self):
+        return auto.LocalWorkspace(
+            project_settings=auto.ProjectSettings(
+                name=self.project_name, runtime="python"
+            )
+        )
+
+    def _warm(self):
+        while self._idle.qsize() < self.size:
+            self._idle.put(self._create())
+
+    @contextmanager
+    def lease(self, program=None):
+        """yields an idle workspace running `program`, creates one if none is idle"""
+        try:
+            workspace = self._idle.get_nowait()
+        except queue.Empty:
+            workspace = self._create()
+        workspace.program = program
+        try:
+            yield workspace
+        finally:
+            workspace.program = None
+            if self._idle.qsize() < self.size:
+                self._idle.put(workspace)
+
+
+workspaces = WorkspacePool()
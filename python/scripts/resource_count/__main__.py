@@ -1,41 +1,417 @@
 import requests
 import os
+import sys
+import csv
+import json
+import queue
+import sqlite3
+import threading
+import time
 import tabulate
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "pulumi-resource-count.db")
+
+# columns of the csv, jsonl and parquet outputs, with their parquet types
+STACK_COLUMNS = {
+    "org": "string",
+    "project": "string",
+    "stack": "string",
+    "last_update": "int64",
+    "resource_count": "int64",
+}
+GROUP_COLUMNS = {
+    "group": "string",
+    "stacks": "int64",
+    "resources": "int64",
+    "mean": "float64",
+    "p50": "int64",
+    "p90": "int64",
+    "p99": "int64",
+    "max": "int64",
+    "previous_resources": "int64",
+    "growth": "int64",
+}
 
 parser = argparse.ArgumentParser()
 parser.add_argument("org", help="The Pulumi org name to query for stacks")
 parser.add_argument("--lastupdate", help="sort by last update instead of resource count", action="store_true")
-args = parser.parse_args()
+parser.add_argument("--top", help="only show the N largest (or latest) stacks", type=int)
+parser.add_argument("--project", help="only show stacks of this project, can be repeated", action="append")
+parser.add_argument("--group-by", help="report resource totals per 'project', 'owner' or 'tag:<name>' instead of stacks")
+parser.add_argument("--owner-tag", help="stack tag holding the owner for --group-by owner", default="owner")
+parser.add_argument("--since", help="with --group-by, report growth since this many days ago", type=float, default=7)
+parser.add_argument("--format", help="output format", choices=["table", "csv", "jsonl", "parquet"], default="table")
+parser.add_argument("--output", help="file to write to instead of stdout, required for parquet")
+parser.add_argument("--timeout", help="seconds to wait for each page", type=float, default=30)
+parser.add_argument("--retries", help="retries for a page on 429 and 5xx responses", type=int, default=5)
+parser.add_argument("--concurrency", help="stack tag requests running at once", type=int, default=8)
+parser.add_argument("--cache", help="SQLite file the stack list is cached in", default=DEFAULT_CACHE)
+parser.add_argument("--max-age", help="seconds the cached stack list is used without asking the API", type=float, default=300)
+parser.add_argument("--refresh", help="refresh the cache regardless of its age", action="store_true")
+parser.add_argument("--offline", help="only use the cache, never ask the API", action="store_true")
+parser.add_argument("--api-url", help="Pulumi Cloud API, e.g. a local server for testing", default="https://api.pulumi.com")
 
-url = f"https://api.pulumi.com/api/user/stacks?organization={args.org}"
 
-headers = {
-    'Accept': 'application/vnd.pulumi+8',
-    'Content-Type': 'application/json',
-    'Authorization': 'token ' + os.getenv('PULUMI_ACCESS_TOKEN', ''),
-}
+def create_session(token, retries, pool_size=10):
+    # one pooled connection for every page, retrying with exponential backoff
+    # (and honouring Retry-After) on rate limiting and server errors
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        'Accept': 'application/vnd.pulumi+8',
+        'Content-Type': 'application/json',
+        'Authorization': 'token ' + token,
+    })
+    return session
+
+
+def fetch_pages(session, url, org, timeout, pages):
+    # the API only pages forward through continuationToken, so pages are
+    # fetched one after the other, but ahead of the caller processing them
+    params = {'organization': org}
+    try:
+        while True:
+            response = session.get(url, params=params, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+            pages.put(data['stacks'])
+            continuation_token = data.get('continuationToken')
+            if continuation_token is None:
+                break
+            params['continuationToken'] = continuation_token
+        pages.put(None)
+    except Exception as exn:
+        pages.put(exn)
+
+
+def iter_stacks(session, api_url, org, timeout):
+    """yields the org's stacks page by page as they arrive"""
+    # at most two pages are waiting, so memory doesn't grow with the org
+    pages = queue.Queue(maxsize=2)
+    url = api_url.rstrip("/") + "/api/user/stacks"
+    fetcher = threading.Thread(target=fetch_pages, args=(session, url, org, timeout, pages), daemon=True)
+    fetcher.start()
+    while True:
+        page = pages.get()
+        if page is None:
+            return
+        if isinstance(page, Exception):
+            raise page
+        yield from page
+
+
+def fetch_tags(session, api_url, org, project, stack, timeout):
+    # the stack list doesn't include tags, each stack is asked for them
+    url = f"{api_url.rstrip('/')}/api/stacks/{quote(org)}/{quote(project)}/{quote(stack)}"
+    response = session.get(url, timeout=timeout)
+    if response.status_code == 404:
+        # deleted since the refresh, the next one drops it
+        return {}
+    response.raise_for_status()
+    return response.json().get('tags') or {}
+
+
+class StackCache:
+    """the stack lists of orgs in a SQLite file, indexed for the report queries
+
+    A refresh still lists every stack (the API has no "changed since"), but
+    a stack is only written when its lastUpdate differs from the cached one,
+    and stacks missing from the listing are deleted. Every write and delete
+    is also appended to `history`, which the growth reports read.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS stacks (
+                org TEXT NOT NULL,
+                project TEXT NOT NULL,
+                stack TEXT NOT NULL,
+                last_update INTEGER,
+                resource_count INTEGER,
+                data TEXT NOT NULL,
+                PRIMARY KEY (org, project, stack)
+            );
+            CREATE INDEX IF NOT EXISTS stacks_by_count ON stacks (org, resource_count);
+            CREATE INDEX IF NOT EXISTS stacks_by_update ON stacks (org, last_update);
+            CREATE TABLE IF NOT EXISTS orgs (
+                org TEXT PRIMARY KEY,
+                refreshed_at REAL NOT NULL
+            );
+            -- resource count of a stack from recorded_at on, NULL once deleted
+            CREATE TABLE IF NOT EXISTS history (
+                org TEXT NOT NULL,
+                project TEXT NOT NULL,
+                stack TEXT NOT NULL,
+                recorded_at REAL NOT NULL,
+                resource_count INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS history_by_stack ON history (org, project, stack, recorded_at);
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(stacks)")}
+        if 'tags' not in columns:
+            # tags as JSON, fetched when the stack's lastUpdate was tags_update
+            self.db.execute("ALTER TABLE stacks ADD COLUMN tags TEXT")
+            self.db.execute("ALTER TABLE stacks ADD COLUMN tags_update INTEGER")
+
+    def age(self, org):
+        """seconds since the org was refreshed, None when it never was"""
+        row = self.db.execute("SELECT refreshed_at FROM orgs WHERE org = ?", (org,)).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def refresh(self, org, stacks):
+        """merges the org's full stack list, returns (stacks seen, stacks written)"""
+        seen = written = 0
+        now = time.time()
+        with self.db:
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS seen (project TEXT, stack TEXT, PRIMARY KEY (project, stack))")
+            self.db.execute("DELETE FROM seen")
+            for stack in stacks:
+                key = (stack['projectName'], stack['stackName'])
+                self.db.execute("INSERT OR IGNORE INTO seen VALUES (?, ?)", key)
+                seen += 1
+                cursor = self.db.execute(
+                    """
+                    INSERT INTO stacks (org, project, stack, last_update, resource_count, data)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (org, project, stack) DO UPDATE SET
+                        last_update = excluded.last_update,
+                        resource_count = excluded.resource_count,
+                        data = excluded.data
+                    WHERE excluded.last_update IS NOT stacks.last_update
+                    """,
+                    (org, *key, stack.get('lastUpdate'), stack.get('resourceCount'), json.dumps(stack)),
+                )
+                if cursor.rowcount:
+                    written += 1
+                    self.db.execute(
+                        "INSERT INTO history VALUES (?, ?, ?, ?, ?)",
+                        (org, *key, now, stack.get('resourceCount')),
+                    )
+            gone = "org = ? AND (project, stack) NOT IN (SELECT project, stack FROM seen)"
+            self.db.execute(f"INSERT INTO history SELECT org, project, stack, ?, NULL FROM stacks WHERE {gone}", (now, org))
+            self.db.execute(f"DELETE FROM stacks WHERE {gone}", (org,))
+            self.db.execute("INSERT OR REPLACE INTO orgs VALUES (?, ?)", (org, now))
+        return seen, written
+
+    def stale_tags(self, org):
+        """(project, stack, last update) of stacks whose tags need fetching"""
+        return self.db.execute(
+            """
+            SELECT project, stack, last_update FROM stacks
+            WHERE org = ? AND resource_count IS NOT NULL AND tags_update IS NOT last_update
+            """,
+            (org,),
+        ).fetchall()
+
+    def set_tags(self, org, project, stack, last_update, tags):
+        with self.db:
+            self.db.execute(
+                "UPDATE stacks SET tags = ?, tags_update = ? WHERE org = ? AND project = ? AND stack = ?",
+                (json.dumps(tags), last_update, org, project, stack),
+            )
+
+    def _filter(self, org, projects, table="stacks"):
+        sql = f"{table}.org = ?"
+        params = [org]
+        if projects:
+            sql += f" AND {table}.project IN ({', '.join('?' for _ in projects)})"
+            params += projects
+        return sql, params
+
+    def query(self, org, lastupdate=False, top=None, projects=None):
+        """yields cached stacks with resources, largest (or latest) first"""
+        where, params = self._filter(org, projects)
+        sql = f"SELECT data FROM stacks WHERE {where} AND resource_count IS NOT NULL"
+        sql += " ORDER BY last_update DESC" if lastupdate else " ORDER BY resource_count DESC"
+        if top:
+            sql += " LIMIT ?"
+            params.append(top)
+        for (data,) in self.db.execute(sql, params):
+            yield json.loads(data)
+
+    def group_counts(self, org, key, projects=None):
+        """yields (group, resource counts in ascending order) per group
+
+        `key` is an SQL expression over the stack's columns and its params.
+        Rows come sorted from SQLite, one group's counts are in memory at once.
+        """
+        key_sql, key_params = key
+        where, params = self._filter(org, projects)
+        rows = self.db.execute(
+            f"""
+            SELECT {key_sql} AS grp, resource_count FROM stacks
+            WHERE {where} AND resource_count IS NOT NULL
+            ORDER BY grp, resource_count
+            """,
+            key_params + params,
+        )
+        for group, group_rows in groupby(rows, key=lambda row: row[0]):
+            yield group, [count for _, count in group_rows]
+
+    def group_totals_at(self, org, key, at, projects=None):
+        """{group: resources} as of the time `at`, from the history"""
+        key_sql, key_params = key
+        where, params = self._filter(org, projects, table="history")
+        rows = self.db.execute(
+            f"""
+            SELECT {key_sql} AS grp, sum(history.resource_count) FROM history
+            JOIN (
+                SELECT org, project, stack, max(recorded_at) AS recorded_at FROM history
+                WHERE org = ? AND recorded_at <= ? GROUP BY org, project, stack
+            ) latest USING (org, project, stack, recorded_at)
+            LEFT JOIN stacks USING (org, project, stack)
+            WHERE {where}
+            GROUP BY grp
+            """,
+            key_params + [org, at] + params,
+        )
+        return dict(rows.fetchall())
+
+
+def group_key(group_by, owner_tag):
+    """SQL expression and params of a --group-by value"""
+    if group_by == "project":
+        return "project", []
+    if group_by == "owner":
+        group_by = "tag:" + owner_tag
+    if group_by.startswith("tag:"):
+        tag = group_by[len("tag:"):].replace('"', '')
+        return "json_extract(stacks.tags, ?)", [f'$."{tag}"']
+    raise ValueError(f"can't group by '{group_by}', use project, owner or tag:<name>")
+
+
+def percentile(counts, fraction):
+    # nearest rank of the ascending counts
+    return counts[max(0, round(fraction * len(counts)) - 1)]
+
+
+def aggregate(groups, previous):
+    """yields a GROUP_COLUMNS row per (group, counts)"""
+    for group, counts in groups:
+        resources = sum(counts)
+        before = previous.get(group)
+        yield {
+            "group": group,
+            "stacks": len(counts),
+            "resources": resources,
+            "mean": round(resources / len(counts), 2),
+            "p50": percentile(counts, 0.5),
+            "p90": percentile(counts, 0.9),
+            "p99": percentile(counts, 0.99),
+            "max": counts[-1],
+            "previous_resources": before,
+            "growth": None if before is None else resources - before,
+        }
+
+
+def write_rows(rows, columns, output_format, out):
+    """writes dict rows as they come, except the table which needs them all"""
+    if output_format == "table":
+        out.write(tabulate.tabulate(list(rows), headers='keys') + "\n")
+    elif output_format == "csv":
+        writer = csv.DictWriter(out, fieldnames=list(columns), extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    elif output_format == "jsonl":
+        for row in rows:
+            out.write(json.dumps({name: row.get(name) for name in columns}) + "\n")
+
+
+def write_parquet(rows, columns, path, batch_size=10000):
+    # optional, only this output needs pyarrow
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("--format parquet needs pyarrow, pip install pyarrow")
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns.items()])
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def stack_row(stack):
+    return {
+        "org": stack.get('orgName'),
+        "project": stack.get('projectName'),
+        "stack": stack.get('stackName'),
+        "last_update": stack.get('lastUpdate'),
+        "resource_count": stack.get('resourceCount'),
+    }
+
 
-response = requests.get(url, headers=headers)
+def main():
+    args = parser.parse_args()
+    if args.format == "parquet" and not args.output:
+        parser.error("--format parquet needs --output")
+    if args.group_by:
+        try:
+            key = group_key(args.group_by, args.owner_tag)
+        except ValueError as exn:
+            parser.error(str(exn))
+    cache = StackCache(args.cache)
+    session = create_session(os.getenv('PULUMI_ACCESS_TOKEN', ''), args.retries, pool_size=args.concurrency)
 
-data = response.json()
-stacks = data['stacks']
+    age = cache.age(args.org)
+    if args.offline:
+        if age is None:
+            parser.error(f"no cached stacks for '{args.org}', run without --offline first")
+    elif args.refresh or age is None or age > args.max_age:
+        seen, written = cache.refresh(args.org, iter_stacks(session, args.api_url, args.org, args.timeout))
+        print(f"{seen} stacks, {written} changed since the last refresh", file=sys.stderr)
 
-continuationToken = data.get('continuationToken')
+    if args.group_by:
+        if key[1] and not args.offline:
+            # tags of stacks updated since their tags were fetched
+            stale = cache.stale_tags(args.org)
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                tags = executor.map(
+                    lambda row: fetch_tags(session, args.api_url, args.org, row[0], row[1], args.timeout),
+                    stale,
+                )
+                for (project, stack, last_update), stack_tags in zip(stale, tags):
+                    cache.set_tags(args.org, project, stack, last_update, stack_tags)
+        previous = cache.group_totals_at(args.org, key, time.time() - args.since * 86400, args.project)
+        rows = aggregate(cache.group_counts(args.org, key, args.project), previous)
+        columns = GROUP_COLUMNS
+    else:
+        stacks = cache.query(args.org, lastupdate=args.lastupdate, top=args.top, projects=args.project)
+        # the table shows the stacks as the API returned them, like it always has
+        rows = stacks if args.format == "table" else map(stack_row, stacks)
+        columns = STACK_COLUMNS
 
-while continuationToken is not None:
-    response = requests.get(url + '&continuationToken=' + continuationToken, headers=headers)
-    continue_data = response.json()
-    continuationToken = continue_data.get('continuationToken')
-    stacks += continue_data['stacks']
+    if args.format == "parquet":
+        write_parquet(rows, columns, args.output)
+    elif args.output:
+        with open(args.output, "w", newline="") as out:
+            write_rows(rows, columns, args.format, out)
+    else:
+        write_rows(rows, columns, args.format, sys.stdout)
 
-stacks_with_resources = [stack
-           for stack in stacks
-           if 'resourceCount' in stack]
 
-if args.lastupdate:
-    sorted_stacks = sorted(stacks_with_resources, key=lambda x: x['lastUpdate'], reverse=True)
-else:
-    sorted_stacks = sorted(stacks_with_resources, key=lambda x: x['resourceCount'], reverse=True)
-    
-print(tabulate.tabulate(sorted_stacks, headers='keys'))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""runs the script against a local fake of the API, `python -m pytest resource_count`"""
+
+import importlib.util
+import json
+import sqlite3
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+# the script is run as `python resource_count`, load its __main__ as a module
+spec = importlib.util.spec_from_file_location("resource_count", Path(__file__).with_name("__main__.py"))
+resource_count = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(resource_count)
+
+PAGE_SIZE = 2
+
+
+def make_stack(project, stack, resource_count, last_update=1):
+    return {
+        'orgName': 'acme',
+        'projectName': project,
+        'stackName': stack,
+        'lastUpdate': last_update,
+        'resourceCount': resource_count,
+    }
+
+
+class FakeApi:
+    """stacks and tags served like the Pulumi Cloud API, requests are recorded"""
+
+    def __init__(self):
+        self.stacks = []
+        self.tags = {}
+        self.requests = []
+
+
+@pytest.fixture
+def api():
+    fake = FakeApi()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            fake.requests.append(url.path)
+            if url.path == '/api/user/stacks':
+                query = parse_qs(url.query)
+                start = int(query.get('continuationToken', ['0'])[0])
+                body = {'stacks': fake.stacks[start:start + PAGE_SIZE]}
+                if start + PAGE_SIZE < len(fake.stacks):
+                    body['continuationToken'] = str(start + PAGE_SIZE)
+                self._send(200, body)
+            elif url.path.startswith('/api/stacks/'):
+                _, project, stack = [unquote(part) for part in url.path[len('/api/stacks/'):].split('/')]
+                if (project, stack) in fake.tags:
+                    self._send(200, {'tags': fake.tags[(project, stack)]})
+                else:
+                    self._send(404, {})
+            else:
+                self._send(404, {})
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_port}"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def run(api, tmp_path, monkeypatch, capsys):
+    cache = str(tmp_path / 'cache.db')
+
+    def run(*args):
+        """runs the script, returns (stdout, stderr)"""
+        argv = ['resource_count', 'acme', '--cache', cache, '--api-url', api.url, '--retries', '0', *args]
+        monkeypatch.setattr(sys, 'argv', argv)
+        resource_count.main()
+        return capsys.readouterr()
+
+    run.cache = cache
+    return run
+
+
+def jsonl(out):
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def test_refresh_merges_and_deletes(api, run):
+    api.stacks = [
+        make_stack('web', 'dev', 10),
+        make_stack('web', 'prod', 30),
+        make_stack('db', 'prod', 20),
+    ]
+    out, err = run('--format', 'jsonl')
+    assert err == "3 stacks, 3 changed since the last refresh\n"
+    assert [row['stack'] for row in jsonl(out)] == ['prod', 'prod', 'dev']
+    # 3 stacks in pages of 2
+    assert api.requests.count('/api/user/stacks') == 2
+
+    api.stacks = [
+        make_stack('web', 'dev', 15, last_update=2),
+        make_stack('web', 'prod', 30),
+    ]
+    out, err = run('--format', 'jsonl', '--refresh')
+    assert err == "2 stacks, 1 changed since the last refresh\n"
+    assert [(row['project'], row['stack'], row['resource_count']) for row in jsonl(out)] == [
+        ('web', 'prod', 30),
+        ('web', 'dev', 15),
+    ]
+
+
+def test_cache_is_used_until_max_age(api, run):
+    api.stacks = [make_stack('web', 'dev', 10)]
+    run('--format', 'jsonl')
+    api.requests.clear()
+
+    out, err = run('--format', 'jsonl')
+    assert api.requests == []
+    assert err == ""
+    assert len(jsonl(out)) == 1
+
+    run('--format', 'jsonl', '--max-age', '0')
+    assert api.requests == ['/api/user/stacks']
+
+
+def test_top_and_project(api, run):
+    api.stacks = [
+        make_stack('web', 'dev', 10),
+        make_stack('web', 'prod', 30),
+        make_stack('web', 'stage', 20),
+        make_stack('db', 'prod', 40),
+    ]
+    out, _ = run('--format', 'csv', '--top', '2')
+    assert out.splitlines() == [
+        'org,project,stack,last_update,resource_count',
+        'acme,db,prod,1,40',
+        'acme,web,prod,1,30',
+    ]
+
+    out, _ = run('--format', 'jsonl', '--project', 'web', '--top', '2')
+    assert [row['stack'] for row in jsonl(out)] == ['prod', 'stage']
+
+    out, _ = run('--format', 'jsonl', '--project', 'db', '--project', 'web')
+    assert len(jsonl(out)) == 4
+
+
+def test_group_by_project(api, run):
+    api.stacks = [
+        make_stack('web', 'dev', 10),
+        make_stack('web', 'prod', 30),
+        make_stack('db', 'prod', 20),
+    ]
+    out, _ = run('--format', 'jsonl', '--group-by', 'project')
+    groups = {row['group']: row for row in jsonl(out)}
+    assert groups['web']['stacks'] == 2
+    assert groups['web']['resources'] == 40
+    assert groups['web']['mean'] == 20
+    assert groups['web']['max'] == 30
+    assert groups['db']['resources'] == 20
+    # the history starts with this refresh, nothing to compare to yet
+    assert groups['web']['previous_resources'] is None
+    assert groups['web']['growth'] is None
+    # the project is a column, no tags needed
+    assert not any(path.startswith('/api/stacks/') for path in api.requests)
+
+
+def test_group_by_owner_fetches_stale_tags_only(api, run):
+    api.stacks = [
+        make_stack('web', 'dev', 10),
+        make_stack('web', 'prod', 30),
+        make_stack('db', 'prod', 20),
+    ]
+    api.tags = {
+        ('web', 'dev'): {'owner': 'frontend'},
+        ('web', 'prod'): {'owner': 'frontend'},
+        ('db', 'prod'): {'owner': 'data'},
+    }
+    out, _ = run('--format', 'jsonl', '--group-by', 'owner')
+    assert {row['group']: row['resources'] for row in jsonl(out)} == {'frontend': 40, 'data': 20}
+    assert sum(path.startswith('/api/stacks/') for path in api.requests) == 3
+
+    api.requests.clear()
+    api.stacks[2] = make_stack('db', 'prod', 25, last_update=2)
+    api.tags[('db', 'prod')] = {'owner': 'platform'}
+    out, _ = run('--format', 'jsonl', '--group-by', 'owner', '--refresh')
+    assert {row['group']: row['resources'] for row in jsonl(out)} == {'frontend': 40, 'platform': 25}
+    assert [path for path in api.requests if path.startswith('/api/stacks/')] == ['/api/stacks/acme/db/prod']
+
+
+def test_group_by_rejects_unknown_key(run):
+    with pytest.raises(SystemExit):
+        run('--group-by', 'region')
+
+
+def test_group_growth_since(api, run):
+    api.stacks = [
+        make_stack('web', 'dev', 10),
+        make_stack('web', 'prod', 30),
+        make_stack('db', 'prod', 20),
+    ]
+    run('--format', 'jsonl')
+    # pretend that refresh happened two days ago
+    db = sqlite3.connect(run.cache)
+    with db:
+        db.execute("UPDATE history SET recorded_at = recorded_at - 2 * 86400")
+    db.close()
+
+    api.stacks = [
+        make_stack('web', 'dev', 15, last_update=2),
+        make_stack('web', 'prod', 30),
+        make_stack('web', 'stage', 5),
+    ]
+    out, _ = run('--format', 'jsonl', '--group-by', 'project', '--refresh', '--since', '1')
+    groups = {row['group']: row for row in jsonl(out)}
+    assert groups['web']['resources'] == 50
+    assert groups['web']['previous_resources'] == 40
+    assert groups['web']['growth'] == 10
+    # deleted since, it isn't in the report any more
+    assert 'db' not in groups
+
+    # before the first refresh there is nothing to compare to
+    out, _ = run('--format', 'jsonl', '--group-by', 'project', '--since', '3')
+    assert jsonl(out)[0]['previous_resources'] is None